@@ -1,18 +1,41 @@
-from fastapi import FastAPI, HTTPException, status
-from .models import BlogRequest, BlogResponse
-from typing import List
-from datetime import datetime
-from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .models import BlogDetail, BlogPage, BlogRequest, BlogResponse, JobResponse
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+import json
 import sys
 import os
+import time
 
 # Add parent directory to path to import blog generation modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scraper import WebScraper
-from reddit_parser import RedditParser
-from blog_generator import OpenAIBlogGenerator, ClaudeBlogGenerator
+from blog_store import close_store, get_store
+from clients import close_clients, get_clients
+from dedup import deduplicate
+from ingestion import ingest_sources
 from image_processor import ImageProcessor
+from jobs import JOB_WORKERS, WorkerPool, create_job_queue
+from metrics import REGISTRY
+from pipeline import get_generator, save_blog, stream_blog, update_sources
+
+job_queue = create_job_queue()
+# Workers can also run in separate processes with `python worker.py`
+worker_pool = WorkerPool(job_queue, size=JOB_WORKERS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared provider clients and workers once, and close them on shutdown."""
+    app.state.clients = get_clients()
+    await run_in_threadpool(app.state.clients.warm)
+    if worker_pool.size > 0:
+        worker_pool.start()
+    yield
+    await run_in_threadpool(worker_pool.stop, 5)
+    await run_in_threadpool(close_store)
+    await run_in_threadpool(close_clients)
 
 app = FastAPI(
     title="AI Blog Writer API",
@@ -20,17 +43,19 @@ app = FastAPI(
     AI Blog Writer API allows you to generate AI-powered blog posts by combining content from:
     * Web pages (via URL scraping)
     * Reddit discussions (via subreddit or post URLs)
-    
+
     The API supports two AI models:
     * OpenAI GPT
     * Anthropic Claude
-    
+
     Features:
     * Web content scraping
     * Reddit content parsing
     * Image processing with alt text generation
     * Markdown blog post generation
-    * Automatic blog file saving
+    * Streaming generation over Server-Sent Events
+    * Background jobs for long-running generations
+    * Blog storage with paging and full-text search
     """,
     version="1.0.0",
     contact={
@@ -39,7 +64,8 @@ app = FastAPI(
     },
     license_info={
         "name": "MIT License",
-    }
+    },
+    lifespan=lifespan
 )
 
 @app.post(
@@ -52,20 +78,30 @@ app = FastAPI(
 async def generate_blog(request: BlogRequest):
     """
     Generate an AI-written blog post by combining content from multiple sources.
-    
+
     ## Request Body
     - **urls**: Optional list of web URLs to scrape for content
     - **subreddits**: Optional list of subreddit names or Reddit post URLs
-    - **ai_model**: AI model to use ('openai' or 'claude')
-    
+    - **ai_model**: AI model to use ('openai' or 'claude'; 'hedged' or 'auto' to race both providers when one is slow)
+    - **use_cache**: Set to false to fetch every source again instead of using the content cache
+    - **fresh**: Set to true to generate a new post even if the same sources and model were used before
+    - **update**: Id of a previous blog to regenerate from its sources (plus any given here). Sources
+      whose content did not change reuse their summary from the previous run
+
     ## Returns
     - **content**: The generated blog post content in Markdown format
-    - **filename**: Path to the saved blog post file
-    
+    - **blog_id**: Id of the blog in the blog store (`GET /blogs/{id}`), also used as `update` later
+    - **filename**: Path of the blog's compressed content file, written in the background
+    - **errors**: Sources that could not be scraped/parsed or timed out
+
+    All sources are fetched concurrently. A failing source does not fail the
+    request as long as at least one source succeeds.
+
     ## Raises
-    - **400**: If no content could be scraped/parsed or invalid URLs provided
+    - **400**: If no content could be scraped/parsed from any source
+    - **404**: If the blog to update does not exist
     - **500**: If blog generation fails
-    
+
     ## Example
     ```json
     {
@@ -75,63 +111,237 @@ async def generate_blog(request: BlogRequest):
     }
     ```
     """
-    
-    # Initialize components
-    web_scraper = WebScraper()
-    reddit_parser = RedditParser()
-    image_processor = ImageProcessor()
-
-    content = []
-
-    # Process website URLs
-    if request.urls:
-        for url in request.urls:
-            try:
-                scraped_content = web_scraper.scrape(url)
-                content.append(scraped_content)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error scraping {url}: {str(e)}")
-
-    # Process Reddit content
-    if request.subreddits:
-        for subreddit in request.subreddits:
-            try:
-                reddit_content = reddit_parser.parse(subreddit)
-                content.append(reddit_content)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Error parsing Reddit content {subreddit}: {str(e)}")
 
-    if not content:
-        raise HTTPException(status_code=400, detail="No content was successfully scraped or parsed")
-
-    # Process images and generate alt text
-    processed_content = image_processor.process_images(content)
+    update_of = request.update
+    request, processed_content, errors, timings = await _ingest(request)
 
     # Generate blog using selected AI model
     try:
-        generator = OpenAIBlogGenerator() if request.ai_model == 'openai' else ClaudeBlogGenerator()
-        blog_content = generator.generate(processed_content)
-        
-        # Create blogs directory if it doesn't exist
-        blogs_dir = Path("blogs")
-        blogs_dir.mkdir(exist_ok=True)
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"blog_{timestamp}.md"
-        filepath = blogs_dir / filename
-        
-        # Save blog content to file
-        with open(filepath, "w") as f:
-            f.write(blog_content)
-            
+        generator = get_generator(request.ai_model, use_cache=not request.fresh, incremental=bool(update_of))
+        start = time.perf_counter()
+        blog_content = await run_in_threadpool(generator.generate, processed_content)
+        timings['generating'] = time.perf_counter() - start
+
+        # Queue the blog for the blog store; the request does not wait for the write
+        record = await run_in_threadpool(
+            save_blog, blog_content, generator, request.ai_model, request.urls, request.subreddits, errors,
+            request.title, update_of, timings
+        )
+
         return BlogResponse(
             content=blog_content,
-            filename=str(filepath)
+            blog_id=record['id'],
+            filename=str(get_store().file_path(record)),
+            errors=errors
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating blog: {str(e)}")
 
+@app.post(
+    "/generate/stream",
+    summary="Generate a blog post as a stream",
+    response_description="Server-Sent Events stream of the generated blog post",
+    response_class=StreamingResponse
+)
+async def generate_blog_stream(request: BlogRequest):
+    """
+    Generate an AI-written blog post and stream it back as Server-Sent Events.
+
+    Takes the same request body as `POST /generate`. Sources are ingested
+    first; the post is then streamed token by token, written to a draft in
+    the blog store as it arrives, and saved as a blog once complete. If the
+    stream is interrupted, the draft keeps the text generated so far.
+
+    ## Events
+    - **token**: `{"text": ...}` for each piece of generated text
+    - **done**: `{"blog_id": ..., "filename": ..., "errors": [...]}` once the blog is saved
+    - **error**: `{"detail": ...}` if generation fails mid-stream
+
+    ## Raises
+    - **400**: If no content could be scraped/parsed from any source
+    - **404**: If the blog to update does not exist
+    """
+
+    update_of = request.update
+    request, processed_content, errors, timings = await _ingest(request)
+
+    def events():
+        # Starlette iterates this in a worker thread, so blocking calls are fine
+        try:
+            generator = get_generator(request.ai_model, use_cache=not request.fresh, incremental=bool(update_of))
+            start = time.perf_counter()
+            draft = get_store().draft()
+            parts = []
+            for text in stream_blog(generator, processed_content, draft):
+                parts.append(text)
+                yield _sse("token", {"text": text})
+            timings['generating'] = time.perf_counter() - start
+            record = save_blog(
+                ''.join(parts), generator, request.ai_model, request.urls, request.subreddits, errors,
+                request.title, update_of, timings, draft
+            )
+            yield _sse("done", {"blog_id": record['id'], "filename": str(get_store().file_path(record)), "errors": errors})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating blog: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue a blog post for generation",
+    response_description="The queued job"
+)
+async def create_job(request: BlogRequest):
+    """
+    Queue a blog post for generation and return immediately.
+
+    Takes the same request body as `POST /generate`. A background worker runs
+    ingestion, image processing and generation; poll `GET /jobs/{id}` for the
+    status and the result.
+    """
+    job_id = await run_in_threadpool(job_queue.submit, request.model_dump())
+    worker_pool.notify()
+    return await run_in_threadpool(job_queue.get, job_id)
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Get a blog generation job",
+    response_description="Job status, current stage and result"
+)
+async def get_job(job_id: str):
+    """
+    Get the status of a queued blog generation job.
+
+    ## Returns
+    - **status**: 'queued', 'running', 'completed' or 'failed'
+    - **stage**: Current pipeline stage ('ingesting', 'deduplicating', 'processing_images', 'generating' or 'saving')
+    - **result**: The generated blog once the job completed
+    - **error**: The failure reason if the job failed
+
+    ## Raises
+    - **404**: If no job with this id exists
+    """
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+async def _ingest(request: BlogRequest) -> Tuple[BlogRequest, List[Dict], List[Dict], Dict[str, float]]:
+    """Fetch all sources of a request and process their images.
+
+    For an update the returned request carries the previous blog's sources
+    too. Also returns the seconds spent in each stage.
+    """
+    if request.update:
+        try:
+            urls, subreddits = await run_in_threadpool(update_sources, request.update, request.urls, request.subreddits)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        request = request.model_copy(update={'urls': urls, 'subreddits': subreddits})
+
+    timings = {}
+    start = time.perf_counter()
+    # Fetch every source concurrently; failed sources are reported, not fatal
+    content, errors = await ingest_sources(request.urls, request.subreddits, use_cache=request.use_cache)
+    timings['ingesting'] = time.perf_counter() - start
+
+    if not content:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "No content was successfully scraped or parsed",
+                "errors": errors,
+            }
+        )
+
+    # Drop paragraphs and comments repeated across sources, and known boilerplate
+    start = time.perf_counter()
+    content = await run_in_threadpool(deduplicate, content)
+    timings['deduplicating'] = time.perf_counter() - start
+
+    # Process images and generate alt text
+    image_processor = ImageProcessor()
+    start = time.perf_counter()
+    processed_content = await run_in_threadpool(image_processor.process_images, content)
+    timings['processing_images'] = time.perf_counter() - start
+    return request, processed_content, errors, timings
+
+@app.get(
+    "/blogs",
+    response_model=BlogPage,
+    summary="List or search blog posts",
+    response_description="A page of blog posts, newest first"
+)
+async def list_blogs(
+    q: Optional[str] = Query(None, description="Words that must all appear in the title or content"),
+    limit: int = Query(20, ge=1, le=100, description="Blog posts per page"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+):
+    """
+    List saved blog posts, newest first, optionally filtered by a full-text search.
+
+    ## Returns
+    - **items**: Metadata of each blog post (sources, model, timings, token counts), without the content
+    - **next_cursor**: Pass as `cursor` to get the next page; null on the last page
+
+    Blogs appear here once their background write is done, a moment after generation.
+    """
+    items, next_cursor = await run_in_threadpool(get_store().list, limit, cursor, q)
+    return BlogPage(items=items, next_cursor=next_cursor)
+
+@app.get(
+    "/blogs/{blog_id}",
+    response_model=BlogDetail,
+    summary="Get a blog post",
+    response_description="The blog post's metadata and Markdown content"
+)
+async def get_blog(blog_id: str):
+    """
+    Get a saved blog post with its metadata.
+
+    ## Raises
+    - **404**: If no blog with this id exists
+    """
+    store = get_store()
+    record = await run_in_threadpool(store.get, blog_id)
+    content = await run_in_threadpool(store.read, blog_id) if record else None
+    if record is None or content is None:
+        raise HTTPException(status_code=404, detail=f"Blog {blog_id} not found")
+    return BlogDetail(**record, content=content)
+
+def _sse(event: str, data: Dict) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    response_description="Stage timings, byte, token and cache counters in the Prometheus text format",
+    response_class=PlainTextResponse
+)
+async def metrics():
+    """
+    Expose per-stage instrumentation for Prometheus.
+
+    - **blog_stage_duration_seconds**: Histogram of time spent per stage
+      (scrape, reddit, images, generate, save)
+    - **blog_stage_errors_total**: Stage calls that raised
+    - **blog_stage_bytes_total**: Bytes downloaded or written per stage
+    - **blog_llm_tokens_total**: LLM input/output tokens per provider
+    - **blog_cache_requests_total**: Content cache hits and misses per kind
+
+    Metrics are kept per process; scrape every API process (and worker
+    process) separately.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get(
     "/",
     summary="API Information",
@@ -140,7 +350,7 @@ async def generate_blog(request: BlogRequest):
 async def root():
     """
     Get basic information about the AI Blog Writer API.
-    
+
     Returns basic metadata including:
     - API name
     - Current version
@@ -1,12 +1,55 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 
 class BlogRequest(BaseModel):
     urls: List[str] = []
     subreddits: List[str] = []
     ai_model: str = "openai"
     title: str
+    use_cache: bool = True
+    fresh: bool = False
+    update: Optional[str] = None
+
+class SourceError(BaseModel):
+    source: str
+    type: str
+    error: str
+
+class BlogRecord(BaseModel):
+    id: str
+    title: str
+    ai_model: Optional[str] = None
+    model: Optional[str] = None
+    urls: List[str] = []
+    subreddits: List[str] = []
+    errors: List[SourceError] = []
+    update_of: Optional[str] = None
+    bytes: int
+    stored_bytes: int
+    timings: Dict[str, float] = {}
+    input_tokens: int = 0
+    output_tokens: int = 0
+    created_at: float
+
+class BlogDetail(BlogRecord):
+    content: str
+
+class BlogPage(BaseModel):
+    items: List[BlogRecord]
+    next_cursor: Optional[str] = None
 
 class BlogResponse(BaseModel):
     content: str
-    filename: str
\ No newline at end of file
+    blog_id: Optional[str] = None
+    filename: str
+    errors: List[SourceError] = []
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    stage: Optional[str] = None
+    result: Optional[BlogResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+from api.models import BlogRequest
+from pipeline import run_pipeline
+from ratelimit import BATCH, priority
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+
+def read_jobs(path: str) -> Iterator[Tuple[str, Dict]]:
+    """Yield (job id, job) for every line of a JSONL job file, without loading it whole.
+
+    The id is the job's 'id' or 'request_id' field, or its line number.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line-{line_number}", {'_invalid': f"Invalid JSON: {str(e)}"}
+                continue
+            if not isinstance(job, dict):
+                yield f"line-{line_number}", {'_invalid': "Invalid job: expected a JSON object"}
+                continue
+            yield str(job.get('id') or job.get('request_id') or f"line-{line_number}"), job
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids of the jobs an earlier run of the batch already completed."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line of an interrupted run can be cut short
+                continue
+            if result.get('status') == 'completed':
+                done.add(result['id'])
+    return done
+
+
+def run_batch(
+    jobs_path: str,
+    output_path: str,
+    workers: int = BATCH_WORKERS,
+    ai_model: Optional[str] = None,
+    on_result: Optional[Callable[[Dict], None]] = None,
+) -> Dict[str, int]:
+    """Run every job of a JSONL file in parallel and append one result line per job.
+
+    Jobs already completed in output_path are skipped, so an interrupted
+    batch picks up where it stopped; failed jobs are run again. All jobs
+    share the process-wide content cache and provider clients. ai_model
+    is used for jobs that do not name one. Returns the number of
+    completed, failed and skipped jobs.
+    """
+    done = completed_ids(output_path)
+    counts: Counter = Counter()
+    lock = threading.Lock()
+
+    with open(output_path, 'a') as out:
+        # Start on a fresh line if the previous run was interrupted mid-write
+        if out.tell() > 0:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    out.write('\n')
+
+        def record(future):
+            if future.cancelled():
+                return
+            result = future.result()
+            with lock:
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+                counts[result['status']] += 1
+            if on_result:
+                on_result(result)
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        pending = set()
+        try:
+            for job_id, job in read_jobs(jobs_path):
+                if job_id in done:
+                    counts['skipped'] += 1
+                    continue
+                # Keep only a few jobs ahead of the workers, however long the file is
+                if len(pending) >= workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                future = pool.submit(_run_job, job_id, job, ai_model)
+                future.add_done_callback(record)
+                pending.add(future)
+            pool.shutdown(wait=True)
+        except KeyboardInterrupt:
+            # Let running jobs finish and be recorded; queued ones run on resume
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return dict(counts)
+
+
+def _run_job(job_id: str, job: Dict, ai_model: Optional[str]) -> Dict:
+    """Run one job through the pipeline; failures become a result line, not an exception."""
+    start = time.perf_counter()
+    try:
+        if '_invalid' in job:
+            raise Exception(job['_invalid'])
+        if ai_model and 'ai_model' not in job:
+            job = {**job, 'ai_model': ai_model}
+        request = BlogRequest.model_validate(job)
+
+        # Batch jobs give way to interactive requests at the providers
+        with priority(BATCH):
+            result = run_pipeline(
+                request.urls,
+                request.subreddits,
+                ai_model=request.ai_model,
+                use_cache=request.use_cache,
+                fresh=request.fresh,
+                update=request.update,
+                title=request.title,
+            )
+        return {
+            'id': job_id,
+            'status': 'completed',
+            'blog_id': result['blog_id'],
+            'filename': result['filename'],
+            'errors': result['errors'],
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+    except Exception as e:
+        return {
+            'id': job_id,
+            'status': 'failed',
+            'error': str(e) or type(e).__name__,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
@@ -0,0 +1,105 @@
+"""Micro-benchmark of HTML extraction on the saved pages in benchmarks/fixtures.
+
+Compares the original BeautifulSoup/html.parser path of WebScraper.scrape with
+the streaming extractor, on each available backend.
+
+    python benchmarks/bench_extraction.py --repeat 50 --scale 20
+"""
+import os
+import sys
+import time
+from pathlib import Path
+from statistics import median
+
+import click
+
+# Add parent directory to path to import the scraper modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import EXTRACT_MAX_TEXT_CHARS, etree, extract_html
+
+FIXTURES = Path(__file__).parent / "fixtures"
+CHUNK_SIZE = 16 * 1024
+
+
+def extract_with_soup(html: bytes) -> dict:
+    """The extraction WebScraper.scrape used before the streaming extractor."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html.decode('utf-8', errors='replace'), 'html.parser')
+    content = {
+        'title': soup.title.string if soup.title else '',
+        'text': '',
+        'images': []
+    }
+    main_content = soup.find('main') or soup.find('article') or soup.body
+    if main_content:
+        content['text'] = ' '.join([p.get_text().strip() for p in main_content.find_all('p')])
+    for img in soup.find_all('img'):
+        if img.get('src'):
+            content['images'].append({
+                'url': img['src'],
+                'current_alt': img.get('alt', ''),
+            })
+    return content
+
+
+def same_output(result: dict, baseline: dict) -> bool:
+    """Compare extractions, ignoring whitespace: the extractor puts paragraphs on separate lines."""
+    def normalized(content: dict) -> dict:
+        return {**content, 'text': ' '.join(content['text'].split())}
+    return normalized(result) == normalized(baseline)
+
+
+def scaled(html: bytes, scale: int) -> bytes:
+    """Repeat the page body to simulate a larger page."""
+    if scale <= 1:
+        return html
+    start = html.find(b'<body')
+    start = html.find(b'>', start) + 1
+    end = html.rfind(b'</body>')
+    return html[:start] + html[start:end] * scale + html[end:]
+
+
+def chunks(html: bytes):
+    for i in range(0, len(html), CHUNK_SIZE):
+        yield html[i:i + CHUNK_SIZE]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+@click.command()
+@click.option('--repeat', '-r', default=20, show_default=True, help='Runs per fixture and engine')
+@click.option('--scale', '-s', default=1, show_default=True, help='Repeat each page body this many times')
+@click.option('--max-text-chars', default=EXTRACT_MAX_TEXT_CHARS, show_default=True, help='Text cap for the streaming extractor')
+def main(repeat, scale, max_text_chars):
+    """Benchmark HTML extraction engines on the saved fixtures."""
+    backends = ['html.parser'] + (['lxml'] if etree is not None else [])
+    click.echo(f"{'fixture':<22}{'bytes':>10}{'engine':>16}{'median ms':>12}{'speedup':>10}{'same output':>13}")
+
+    for path in sorted(FIXTURES.glob("*.html")):
+        html = scaled(path.read_bytes(), scale)
+        baseline = extract_with_soup(html)
+        baseline_time = timed(lambda: extract_with_soup(html), repeat)
+        click.echo(f"{path.name:<22}{len(html):>10}{'bs4 (current)':>16}{baseline_time * 1000:>12.2f}{'1.0x':>10}{'-':>13}")
+
+        for backend in backends:
+            result = extract_html(chunks(html), max_text_chars=max_text_chars, backend=backend)
+            elapsed = timed(lambda: extract_html(chunks(html), max_text_chars=max_text_chars, backend=backend), repeat)
+            click.echo(
+                f"{'':<22}{'':>10}{backend:>16}{elapsed * 1000:>12.2f}"
+                f"{baseline_time / elapsed:>9.1f}x{str(same_output(result, baseline)):>13}"
+            )
+
+    click.echo("\nOutput can differ on pages with unclosed <p> tags, which html.parser nests instead of closing.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""End-to-end benchmark of the blog pipeline, fully offline.
+
+Every outbound call goes to the local stand-ins in benchmarks/stubs.py. Each
+scenario runs one driver at one concurrency level and number of sources:
+
+* pipeline: pipeline.run_pipeline in threads, with a per-stage breakdown
+* api:      POST /generate against the FastAPI app served by uvicorn
+* stream:   POST /generate/stream, reporting time to the first token
+* cli:      `python cli.py` subprocesses, including interpreter startup
+
+Results are written as JSON so runs on different commits can be compared:
+
+    python benchmarks/bench_pipeline.py --drivers pipeline,api --concurrency 1,8 --sources 1,10
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/<older run>.json
+"""
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from statistics import mean
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Add parent directory to path to import the blog generation modules
+sys.path.append(str(ROOT))
+
+from stubs import StubServer
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'mean': mean(ordered),
+        'max': ordered[-1],
+    }
+
+
+def source_mix(stubs: StubServer, count: int) -> Tuple[List[str], List[str]]:
+    """Split a number of sources into pages and subreddits, about 4 to 1."""
+    subreddits = [f"bench{i}" for i in range(count // 5)]
+    return stubs.page_urls(count - len(subreddits)), subreddits
+
+
+def run_requests(concurrency: int, requests: int, fn) -> Tuple[List, float]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: fn(i), range(requests)))
+    return results, time.perf_counter() - start
+
+
+def drive_pipeline(stubs, concurrency, sources, requests, model, cached) -> Dict:
+    from pipeline import run_pipeline
+
+    urls, subreddits = source_mix(stubs, sources)
+
+    def one(_):
+        marks = []
+        start = time.perf_counter()
+        try:
+            run_pipeline(urls, subreddits, model, use_cache=cached, fresh=not cached,
+                         on_stage=lambda stage: marks.append((stage, time.perf_counter())))
+            error = None
+        except Exception as e:
+            error = str(e)
+        end = time.perf_counter()
+        stages = {
+            stage: (marks[i + 1][1] if i + 1 < len(marks) else end) - at
+            for i, (stage, at) in enumerate(marks)
+        }
+        return end - start, stages, error
+
+    results, wall = run_requests(concurrency, requests, one)
+    stage_names = {stage for _, stages, _ in results for stage in stages}
+    return {
+        'wall_s': wall,
+        'latency': percentiles([latency for latency, _, error in results if error is None]),
+        'stages': {
+            stage: percentiles([stages[stage] for _, stages, _ in results if stage in stages])
+            for stage in sorted(stage_names)
+        },
+        'errors': [error for _, _, error in results if error][:5],
+        'error_count': sum(1 for _, _, error in results if error),
+    }
+
+
+class ApiServer:
+    """Runs the FastAPI app with uvicorn in a background thread."""
+
+    def __init__(self):
+        import uvicorn
+        from api.main import app
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(app, host='127.0.0.1', port=self.port, log_level='warning')
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def drive_api(stubs, concurrency, sources, requests, model, cached, stream=False) -> Dict:
+    import httpx
+
+    urls, subreddits = source_mix(stubs, sources)
+    body = {'urls': urls, 'subreddits': subreddits, 'ai_model': model, 'title': 'Benchmark',
+            'use_cache': cached, 'fresh': not cached}
+
+    with ApiServer() as base_url, httpx.Client(base_url=base_url, timeout=600) as client:
+        def one(_):
+            start = time.perf_counter()
+            first_token = None
+            try:
+                if stream:
+                    with client.stream('POST', '/generate/stream', json=body) as response:
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            if first_token is None and line.startswith('event: token'):
+                                first_token = time.perf_counter() - start
+                            if line.startswith('event: error'):
+                                raise Exception(next(response.iter_lines()))
+                else:
+                    client.post('/generate', json=body).raise_for_status()
+                error = None
+            except Exception as e:
+                error = str(e)
+            return time.perf_counter() - start, first_token, error
+
+        results, wall = run_requests(concurrency, requests, one)
+
+    summary = {
+        'wall_s': wall,
+        'latency': percentiles([latency for latency, _, error in results if error is None]),
+        'errors': [error for _, _, error in results if error][:5],
+        'error_count': sum(1 for _, _, error in results if error),
+    }
+    if stream:
+        summary['time_to_first_token'] = percentiles([ttft for _, ttft, _ in results if ttft is not None])
+    return summary
+
+
+def drive_cli(stubs, concurrency, sources, requests, model, cached) -> Dict:
+    urls, subreddits = source_mix(stubs, sources)
+    command = [sys.executable, str(ROOT / "cli.py"), 'create-blog', '-m', model]
+    command += [arg for url in urls for arg in ('-u', url)]
+    command += [arg for subreddit in subreddits for arg in ('-s', subreddit)]
+    if not cached:
+        command += ['--no-cache', '--fresh']
+
+    def one(_):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        ok = result.returncode == 0 and "Blog generated successfully" in result.stdout
+        return time.perf_counter() - start, None if ok else (result.stdout + result.stderr)[-500:]
+
+    results, wall = run_requests(concurrency, requests, one)
+    return {
+        'wall_s': wall,
+        'latency': percentiles([latency for latency, error in results if error is None]),
+        'errors': [error for _, error in results if error][:5],
+        'error_count': sum(1 for _, error in results if error),
+        'children_maxrss_mb': _maxrss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+DRIVERS = {
+    'pipeline': drive_pipeline,
+    'api': drive_api,
+    'stream': lambda *args: drive_api(*args, stream=True),
+    'cli': drive_cli,
+}
+
+
+def _maxrss_mb(who=resource.RUSAGE_SELF) -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(who).ru_maxrss * scale / (1024 * 1024)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(',') if part]
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print how p50/p99 latency and throughput changed against a baseline run."""
+    def key(scenario):
+        return (scenario['driver'], scenario['model'], scenario['concurrency'], scenario['sources'])
+
+    before = {key(scenario): scenario for scenario in baseline['scenarios']}
+    click.echo(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}):")
+    for scenario in current['scenarios']:
+        old = before.get(key(scenario))
+        if not old or not old['latency'] or not scenario['latency']:
+            continue
+        changes = [
+            f"{name} {_change(old[section][metric], scenario[section][metric])}"
+            for name, section, metric in (('p50', 'latency', 'p50'), ('p99', 'latency', 'p99'))
+        ]
+        changes.append(f"throughput {_change(old['throughput_rps'], scenario['throughput_rps'])}")
+        click.echo(f"  {scenario['name']:<32}" + "  ".join(changes))
+
+
+def _change(old: float, new: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+@click.command()
+@click.option('--drivers', default='pipeline,api,stream,cli', show_default=True, help='Comma-separated drivers to run')
+@click.option('--concurrency', default='1,4', show_default=True, help='Comma-separated concurrency levels')
+@click.option('--sources', default='1,5', show_default=True, help='Comma-separated numbers of sources per request')
+@click.option('--requests', 'requests_per_scenario', default=8, show_default=True, help='Requests per scenario')
+@click.option('--model', '-m', type=click.Choice(['openai', 'claude']), default='openai', show_default=True)
+@click.option('--latency-ms', default=50.0, show_default=True, help='Stub response latency')
+@click.option('--token-delay-ms', default=5.0, show_default=True, help='Stub delay per generated token')
+@click.option('--tokens', default=200, show_default=True, help='Tokens per stub completion')
+@click.option('--cached', is_flag=True, help='Let the content and generation caches answer repeated work')
+@click.option('--trace-memory/--no-trace-memory', default=True, show_default=True, help='Track peak Python allocations per scenario')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='Result file (default: benchmarks/results/<time>-<commit>.json)')
+@click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False), default=None, help='Earlier result file to compare against')
+def main(drivers, concurrency, sources, requests_per_scenario, model, latency_ms, token_delay_ms, tokens,
+         cached, trace_memory, output, baseline_path):
+    """Benchmark the pipeline, API and CLI against local provider stand-ins."""
+    # Resolve paths before moving into the scratch directory
+    output_path = Path(output).resolve() if output else None
+    baseline_file = Path(baseline_path).resolve() if baseline_path else None
+
+    stubs = StubServer(latency=latency_ms / 1000, token_delay=token_delay_ms / 1000, tokens=tokens)
+    stubs.start()
+
+    # Everything the modules read from the environment must be set before they are imported
+    workdir = tempfile.mkdtemp(prefix="blog-bench-")
+    os.environ.update(stubs.environ())
+    os.environ.update({'CACHE_DIR': str(Path(workdir) / ".cache"), 'JOB_WORKERS': '0'})
+    os.chdir(workdir)
+
+    meta = {
+        'commit': _git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'requests': requests_per_scenario, 'model': model, 'latency_ms': latency_ms,
+            'token_delay_ms': token_delay_ms, 'tokens': tokens, 'cached': cached,
+        },
+    }
+    scenarios = []
+    if trace_memory:
+        tracemalloc.start()
+
+    for driver in drivers.split(','):
+        for level in _ints(concurrency):
+            for count in _ints(sources):
+                name = f"{driver}-c{level}-s{count}"
+                click.echo(f"Running {name}...", nl=False)
+                if trace_memory:
+                    tracemalloc.reset_peak()
+                stubs.requests.clear()
+
+                summary = DRIVERS[driver](stubs, level, count, requests_per_scenario, model, cached)
+
+                summary.update({
+                    'name': name, 'driver': driver, 'model': model, 'concurrency': level, 'sources': count,
+                    'requests': requests_per_scenario,
+                    'throughput_rps': (requests_per_scenario - summary['error_count']) / summary['wall_s'],
+                    'peak_traced_mb': tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_memory else None,
+                    'maxrss_mb': _maxrss_mb(),
+                    'stub_requests': dict(stubs.requests),
+                })
+                scenarios.append(summary)
+                latency = summary['latency']
+                click.echo(
+                    f" p50 {latency.get('p50', 0):.3f}s  p99 {latency.get('p99', 0):.3f}s  "
+                    f"{summary['throughput_rps']:.2f} req/s  errors {summary['error_count']}"
+                )
+                for stage, stats in summary.get('stages', {}).items():
+                    click.echo(f"    {stage:<18} p50 {stats['p50']:.3f}s  p99 {stats['p99']:.3f}s")
+                if 'time_to_first_token' in summary:
+                    click.echo(f"    first token        p50 {summary['time_to_first_token'].get('p50', 0):.3f}s")
+                for error in summary['errors'][:1]:
+                    click.echo(f"    first error: {error}")
+
+    stubs.stop()
+    results = {'meta': meta, 'scenarios': scenarios}
+
+    output_path = output_path or RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}-{meta['commit'] or 'unknown'}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(results, indent=2))
+    click.echo(f"\nResults written to {output_path}")
+
+    if baseline_file:
+        compare(results, json.loads(baseline_file.read_text()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Startup cost of the CLI entry points, tracked against a budget.
+
+Each scenario runs in a fresh interpreter with `-X importtime`. The import
+time reported is for the project's own imports, i.e. without the modules a
+bare interpreter loads anyway. A scenario fails when its median import time
+exceeds the budget in benchmarks/startup_budget.json, or when it imports a
+module it should not need (say, the Anthropic SDK for an OpenAI run).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --scenarios help,scrape_only
+    python benchmarks/bench_startup.py --update-budget   # after an intended change
+
+Scenarios that fetch sources run against the local stand-ins of
+benchmarks/stubs.py, so nothing leaves the machine.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Set, Tuple
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+BUDGET_FILE = Path(__file__).resolve().parent / "startup_budget.json"
+
+from stubs import StubServer
+
+# Budgets written by --update-budget leave this much headroom for noisy machines
+BUDGET_HEADROOM = 1.5
+
+
+def scenarios(stubs: StubServer) -> Dict[str, Dict]:
+    """Command line and environment of every scenario."""
+    page = stubs.page_urls(1)[0]
+    cli = [str(ROOT / "cli.py")]
+    return {
+        'help': {'args': cli + ['--help']},
+        'create_blog_help': {'args': cli + ['create-blog', '--help']},
+        'scrape_only': {'args': cli + ['create-blog', '-u', page, '--warm-cache']},
+        'reddit_only': {'args': cli + ['create-blog', '-s', 'startup', '--warm-cache']},
+        'openai': {'args': cli + ['create-blog', '-u', page, '-m', 'openai'], 'env': {'ALT_TEXT_ENABLED': '0'}},
+        'claude': {'args': cli + ['create-blog', '-u', page, '-m', 'claude'], 'env': {'ALT_TEXT_ENABLED': '0'}},
+        'tui_module': {'args': ['-c', 'import tui']},
+    }
+
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, int], Set[str]]:
+    """Return the cumulative microseconds of each top-level import, and every module imported."""
+    top_level = {}
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        # Nested imports are indented below the module importing them
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, modules
+
+
+def run_once(args: List[str], env: Dict[str, str], cwd: str) -> Tuple[float, Dict[str, int], Set[str]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise click.ClickException(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    top_level, modules = parse_importtime(result.stderr)
+    return elapsed, top_level, modules
+
+
+def measure(name: str, scenario: Dict, base_env: Dict[str, str], baseline: Set[str], runs: int) -> Dict:
+    walls, imports, heaviest = [], [], {}
+    modules: Set[str] = set()
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = {**base_env, 'CACHE_DIR': os.path.join(workdir, '.cache'), **scenario.get('env', {})}
+            wall, top_level, imported = run_once(scenario['args'], env, workdir)
+        own = {module: us for module, us in top_level.items() if module not in baseline}
+        walls.append(wall * 1000)
+        imports.append(sum(own.values()) / 1000)
+        modules |= imported
+        for module, us in own.items():
+            heaviest[module] = max(heaviest.get(module, 0), us)
+
+    return {
+        'scenario': name,
+        'wall_ms': median(walls),
+        'import_ms': median(imports),
+        'heaviest': sorted(heaviest.items(), key=lambda item: item[1], reverse=True)[:3],
+        'packages': sorted({module.split('.')[0] for module in modules}),
+    }
+
+
+def check(result: Dict, budget: Dict) -> List[str]:
+    problems = []
+    if 'import_ms' in budget and result['import_ms'] > budget['import_ms']:
+        problems.append(f"import time {result['import_ms']:.0f} ms over budget of {budget['import_ms']:.0f} ms")
+    loaded = set(result['packages']) & set(budget.get('forbidden', []))
+    if loaded:
+        problems.append(f"imports {', '.join(sorted(loaded))}")
+    return problems
+
+
+@click.command()
+@click.option('--runs', default=5, show_default=True, help='Runs per scenario; the median is reported')
+@click.option('--scenarios', 'selected', default=None, help='Comma-separated scenarios (default: all)')
+@click.option('--update-budget', is_flag=True, help='Write the measured import times, with headroom, as the new budget')
+def main(runs, selected, update_budget):
+    """Measure CLI startup and compare it with the startup budget."""
+    budgets = json.loads(BUDGET_FILE.read_text()) if BUDGET_FILE.exists() else {}
+
+    stubs = StubServer(latency=0, token_delay=0, tokens=20)
+    stubs.start()
+    try:
+        base_env = {**os.environ, **stubs.environ(), 'PYTHONPATH': str(ROOT), 'JOB_WORKERS': '0'}
+        with tempfile.TemporaryDirectory() as workdir:
+            _, _, baseline = run_once(['-c', 'pass'], base_env, workdir)
+
+        all_scenarios = scenarios(stubs)
+        names = selected.split(',') if selected else list(all_scenarios)
+        failed = False
+        click.echo(f"{'scenario':<18} {'wall ms':>8} {'import ms':>10} {'budget':>8}  heaviest imports")
+        for name in names:
+            result = measure(name, all_scenarios[name], base_env, baseline, runs)
+            budget = budgets.get(name, {})
+            problems = check(result, budget)
+            failed = failed or bool(problems)
+            heaviest = ', '.join(f"{module} {us / 1000:.0f}" for module, us in result['heaviest'])
+            click.echo(f"{name:<18} {result['wall_ms']:>8.0f} {result['import_ms']:>10.0f} {budget.get('import_ms', '-'):>8}  {heaviest}")
+            for problem in problems:
+                click.echo(f"  FAIL: {problem}")
+
+            if update_budget:
+                budgets[name] = {**budget, 'import_ms': round(result['import_ms'] * BUDGET_HEADROOM)}
+    finally:
+        stubs.stop()
+
+    if update_budget:
+        BUDGET_FILE.write_text(json.dumps(budgets, indent=2) + "\n")
+        click.echo(f"\nBudget written to {BUDGET_FILE}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Local stand-ins for the websites, Reddit, OpenAI and Anthropic.
+
+A single threaded HTTP server answers every provider, so the whole pipeline
+can run offline. Latency is configurable per response and per streamed token.
+
+    stubs = StubServer(latency=0.05, token_delay=0.01, tokens=200)
+    stubs.start()
+    os.environ.update(stubs.environ())
+"""
+import io
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / "fixtures"
+_IMAGE_SRC = re.compile(rb'src="(?:https?://[^"]*/|/?(?:[^"]*/)?)([^"/]+)"')
+
+
+def _png(width: int, height: int, color: str) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class StubServer:
+    """Serves recorded pages, a fake Reddit API and fake LLM endpoints."""
+
+    def __init__(self, latency: float = 0.05, token_delay: float = 0.005, tokens: int = 200, port: int = 0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.pages = {path.name: path.read_bytes() for path in sorted(FIXTURES.glob("*.html"))}
+        self.images = {
+            'hero.png': _png(640, 360, 'steelblue'),
+            'logo.png': _png(120, 40, 'black'),
+            'pixel.png': _png(1, 1, 'white'),
+        }
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def environ(self) -> Dict[str, str]:
+        """Environment variables pointing every client at this server."""
+        return {
+            'OPENAI_API_KEY': 'stub',
+            'OPENAI_BASE_URL': f"{self.url}/openai/v1",
+            'CLAUDE_API_KEY': 'stub',
+            'ANTHROPIC_BASE_URL': f"{self.url}/anthropic",
+            'REDDIT_CLIENT_ID': 'stub',
+            'REDDIT_CLIENT_SECRET': 'stub',
+            'REDDIT_OAUTH_URL': self.url,
+            'REDDIT_URL': f"{self.url}/reddit",
+            'praw_check_for_updates': 'False',
+        }
+
+    def page_urls(self, count: int) -> List[str]:
+        """Distinct page URLs cycling through the recorded fixtures."""
+        names = list(self.pages)
+        return [f"{self.url}/pages/{i}/{names[i % len(names)]}" for i in range(count)]
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def image(self, name: str) -> bytes:
+        """Any image name resolves to one of a few images, like logos reused across pages."""
+        if 'pixel' in name or name.startswith('t.gif'):
+            return self.images['pixel.png']
+        if 'logo' in name or 'avatar' in name:
+            return self.images['logo.png']
+        return self.images['hero.png']
+
+    def completion_text(self) -> List[str]:
+        return [f"word{i} " for i in range(self.tokens)]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(stub.latency)
+                path = urlsplit(self.path).path
+                if path.startswith('/pages/'):
+                    stub.count('page')
+                    page = stub.pages.get(path.rsplit('/', 1)[-1])
+                    if page:
+                        # Point every image at this server so nothing leaves the machine
+                        page = _IMAGE_SRC.sub(lambda m: b'src="' + stub.url.encode() + b'/images/' + m.group(1) + b'"', page)
+                    return self._send(200 if page else 404, page or b'', 'text/html; charset=utf-8')
+                if path.startswith('/images/'):
+                    stub.count('image')
+                    return self._send(200, stub.image(path.rsplit('/', 1)[-1]), 'image/png')
+                if path.startswith(('/r/', '/comments/')):
+                    stub.count('reddit')
+                    return self._json(self._reddit(path))
+                self._send(404, b'', 'text/plain')
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                path = urlsplit(self.path).path
+                time.sleep(stub.latency)
+                if path == '/reddit/api/v1/access_token':
+                    return self._json({'access_token': 'stub', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'})
+                request = json.loads(body or b'{}')
+                if path == '/openai/v1/chat/completions':
+                    stub.count('openai')
+                    return self._openai(request)
+                if path == '/anthropic/v1/messages':
+                    stub.count('anthropic')
+                    return self._anthropic(request)
+                self._send(404, b'', 'text/plain')
+
+            def _reddit(self, path: str):
+                parts = [part for part in path.split('/') if part]
+                if len(parts) >= 3 and parts[0] == 'r' and parts[2] == 'hot':
+                    limit = int(parse_qs(urlsplit(self.path).query).get('limit', ['5'])[0])
+                    posts = [self._post(f"{parts[1]}{i}", parts[1]) for i in range(limit)]
+                    return {'kind': 'Listing', 'data': {'children': posts, 'after': None, 'before': None}}
+                if parts and parts[0] == 'comments':
+                    post_id = parts[1]
+                    limit = int(parse_qs(urlsplit(self.path).query).get('limit', ['10'])[0])
+                    comments = [{
+                        'kind': 't1',
+                        'data': {
+                            'id': f"{post_id}c{i}", 'name': f"t1_{post_id}c{i}", 'parent_id': f"t3_{post_id}",
+                            'link_id': f"t3_{post_id}", 'body': f"Comment {i} on {post_id}: I agree with most of this.",
+                            'replies': '', 'author': 'stub', 'score': 10 - i,
+                        },
+                    } for i in range(limit)]
+                    return [
+                        {'kind': 'Listing', 'data': {'children': [self._post(post_id, 'stub')], 'after': None, 'before': None}},
+                        {'kind': 'Listing', 'data': {'children': comments, 'after': None, 'before': None}},
+                    ]
+                return {'kind': 'Listing', 'data': {'children': [], 'after': None, 'before': None}}
+
+            def _post(self, post_id: str, subreddit: str) -> Dict:
+                return {
+                    'kind': 't3',
+                    'data': {
+                        'id': post_id, 'name': f"t3_{post_id}", 'subreddit': subreddit,
+                        'title': f"Post {post_id} in r/{subreddit}",
+                        'selftext': "A long self post discussing the news. " * 20,
+                        'author': 'stub', 'permalink': f"/r/{subreddit}/comments/{post_id}/",
+                        'preview': {'images': [{'source': {'url': f"{stub.url}/images/hero.png"}}]},
+                    },
+                }
+
+            def _openai(self, request: Dict):
+                words = stub.completion_text()
+                if not request.get('stream'):
+                    time.sleep(stub.token_delay * len(words))
+                    return self._json({
+                        'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': request.get('model'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': ''.join(words)}}],
+                        'usage': {'prompt_tokens': 0, 'completion_tokens': len(words), 'total_tokens': len(words)},
+                    })
+
+                def events():
+                    for word in words:
+                        time.sleep(stub.token_delay)
+                        yield {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': request.get('model'),
+                               'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]}
+                self._sse((f"data: {json.dumps(event)}\n\n" for event in events()), "data: [DONE]\n\n")
+
+            def _anthropic(self, request: Dict):
+                words = stub.completion_text()
+                message = {
+                    'id': 'stub', 'type': 'message', 'role': 'assistant', 'model': request.get('model'),
+                    'stop_reason': 'end_turn', 'stop_sequence': None,
+                    'usage': {'input_tokens': 0, 'output_tokens': len(words)},
+                }
+                if not request.get('stream'):
+                    time.sleep(stub.token_delay * len(words))
+                    return self._json({**message, 'content': [{'type': 'text', 'text': ''.join(words)}]})
+
+                def events():
+                    yield 'message_start', {'type': 'message_start', 'message': {**message, 'content': [], 'stop_reason': None}}
+                    yield 'content_block_start', {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}
+                    for word in words:
+                        time.sleep(stub.token_delay)
+                        yield 'content_block_delta', {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': word}}
+                    yield 'content_block_stop', {'type': 'content_block_stop', 'index': 0}
+                    yield 'message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None}, 'usage': {'output_tokens': len(words)}}
+                    yield 'message_stop', {'type': 'message_stop'}
+                self._sse(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events())
+
+            def _json(self, data):
+                self._send(200, json.dumps(data).encode(), 'application/json')
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _sse(self, events, final: str = ''):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for event in events:
+                    self._chunk(event.encode())
+                if final:
+                    self._chunk(final.encode())
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -1,74 +1,277 @@
-from typing import Dict, List
-from openai import OpenAI
-from anthropic import Anthropic                                                                                            
-import os                                                                                                                  
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from prompt_packer import ContentPacker
+from cache import ContentCache, get_cache
+from clients import get_clients
+from hedging import get_latency_tracker
+from metrics import record_tokens, span
+from ratelimit import get_scheduler, keep_priority
+from summary_index import SummaryIndex, content_hash
+import hashlib
+import json
+import os
+import threading
 
-class OpenAIBlogGenerator:                                                                                                 
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+if TYPE_CHECKING:
+    # The SDKs are loaded by clients.py when a generator is first created
+    from openai import OpenAI
+    from anthropic import Anthropic
 
-    def generate(self, content: List[Dict]) -> str:                                                                        
-        """Generate blog content using OpenAI."""                                                                          
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "500"))
+# Completion length assumed for rate limiting when a call sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+class BlogGenerator:
+    """Prompt preparation shared by the provider-specific generators.
+
+    Subclasses set provider/name/model and implement _messages, _call and
+    _call_stream. Completions are memoized in the content cache, keyed by
+    the prompt, model and parameters; pass use_cache=False for a fresh one.
+    With a summary index, each source is summarized on its own and the post
+    is written from the summaries; sources whose content did not change
+    since an earlier blog reuse their indexed summary.
+    """
+    provider = ''
+    name = ''
+    model = ''
+
+    def __init__(self, token_budget: Optional[int] = None, use_cache: bool = True, cache: Optional[ContentCache] = None, summaries: Optional[SummaryIndex] = None):
+        self.packer = ContentPacker(self.provider, token_budget, self.model)
+        self.use_cache = use_cache
+        self.cache = cache or get_cache()
+        self.summaries = summaries
+        # Tokens used by this generator's calls, summaries included
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._usage_lock = threading.Lock()
+
+    def generate(self, content: List[Dict]) -> str:
+        """Generate blog content."""
+        try:
+            with span('generate'):
+                # Prepare the content for the prompt
+                combined_content = self._prepare_content(content)
+                return self._complete(self._messages(combined_content))
+
+        except Exception as e:
+            raise Exception(f"Failed to generate blog with {self.name}: {str(e)}")
+
+    def generate_stream(self, content: List[Dict]) -> Iterator[str]:
+        """Generate blog content, yielding text as it arrives."""
+        try:
+            with span('generate'):
+                combined_content = self._prepare_content(content)
+                yield from self._stream(self._messages(combined_content))
+
+        except Exception as e:
+            raise Exception(f"Failed to generate blog with {self.name}: {str(e)}")
+
+    def stream_condensed(self, content: List[Dict]) -> Iterator[str]:
+        """Generate blog content from sources already condensed by condense(), yielding text as it arrives.
+
+        Not timed as a 'generate' stage; the caller is.
+        """
         try:
-            # Prepare the content for the prompt                                                                           
-            combined_content = self._prepare_content(content)                                                              
-            
-            # Generate blog using OpenAI                                                                                   
-            response = self.client.chat.completions.create(                                                                       
-                model="gpt-4",                                                                                             
-                messages=[                                                                                                 
-                    {"role": "system", "content": "You are a professional blog writer. Create a well-structured, engaging  blog post from the provided content."},                                                                                    
-                    {"role": "user", "content": f"Create a blog post from this content: {combined_content}\n\nInclude images with alt text accurately describing what the image is all about. The blog should be formatted in markdown syntax"}
-                ]                                                                                                          
-            )                                                                                                              
-
-            return response.choices[0].message.content                                                                     
-
-        except Exception as e:                                                                                             
-            raise Exception(f"Failed to generate blog with OpenAI: {str(e)}")                                              
-
-    def _prepare_content(self, content: List[Dict]) -> str:                                                                
-        """Prepare content for the AI prompt."""                                                                           
-        combined = ""                                                                                                      
-        for item in content:                                                                                               
-            combined += f"Title: {item.get('title', '')}\n"                                                                
-            combined += f"Content: {item.get('text', '')}\n"                                                               
-            if 'comments' in item:                                                                                         
-                combined += f"Comments: {' '.join(item['comments'])}\n"                                                    
-        return combined                                                                                                    
-
-
-class ClaudeBlogGenerator:                                                                                                 
-    def __init__(self):                                                                                                    
-        self.client = Anthropic(api_key=os.getenv('CLAUDE_API_KEY'))                                                       
-                                                                                                                            
-    def generate(self, content: List[Dict]) -> str:                                                                        
-        """Generate blog content using Claude."""                                                                          
-        try:                                                                                                               
-            # Prepare the content for the prompt                                                                           
-            combined_content = self._prepare_content(content)                                                              
-                                                                                                                            
-            # Generate blog using Claude                                                                                   
-            response = self.client.messages.create(                                                                        
-                model="claude-2",                                                                                          
-                max_tokens=1000,                                                                                           
-                messages=[{                                                                                                
-                    "role": "user",                                                                                        
-                    "content": f"Create a well-structured, engaging blog post from this content: {combined_content}\n\nInclude images with alt text accurately describing what the image is all about"       
-                }]                                                                                                         
-            )                                                                                                              
-                                                                                                                            
-            return response.content[0].text                                                                                
-                                                                                                                            
-        except Exception as e:                                                                                             
-            raise Exception(f"Failed to generate blog with Claude: {str(e)}")                                              
-                                                                                                                            
-    def _prepare_content(self, content: List[Dict]) -> str:                                                                
-        """Prepare content for the AI prompt."""                                                                           
-        combined = ""                                                                                                      
-        for item in content:                                                                                               
-            combined += f"Title: {item.get('title', '')}\n"                                                                
-            combined += f"Content: {item.get('text', '')}\n"                                                               
-            if 'comments' in item:                                                                                         
-                combined += f"Comments: {' '.join(item['comments'])}\n"                                                    
-        return combined
\ No newline at end of file
+            yield from self._stream(self._messages(self.packer.pack(content)))
+
+        except Exception as e:
+            raise Exception(f"Failed to generate blog with {self.name}: {str(e)}")
+
+    def condense(self, content: List[Dict]) -> List[Dict]:
+        """Summarize the sources per source (with a summary index) or, when oversized, by map-reduce."""
+        if self.summaries is not None:
+            return self._summarize_sources(content)
+        if self.packer.needs_map_reduce(content):
+            return self._summarize(content)
+        return content
+
+    def _prepare_content(self, content: List[Dict]) -> str:
+        """Prepare content for the AI prompt, within the token budget."""
+        return self.packer.pack(self.condense(content))
+
+    def _summarize(self, content: List[Dict]) -> List[Dict]:
+        """Summarize chunks of oversized content in parallel (the map step)."""
+        chunks = self.packer.chunk(content)
+        with ThreadPoolExecutor(max_workers=min(len(chunks), MAP_REDUCE_CONCURRENCY)) as pool:
+            summaries = list(pool.map(keep_priority(self._summarize_chunk), chunks))
+
+        return [
+            {'title': f"Summary of sources, part {i + 1}", 'text': summary}
+            for i, summary in enumerate(summaries)
+        ]
+
+    def _summarize_sources(self, content: List[Dict]) -> List[Dict]:
+        """Summarize each source on its own, reusing the indexed summaries of unchanged ones."""
+        with ThreadPoolExecutor(max_workers=min(len(content), MAP_REDUCE_CONCURRENCY)) as pool:
+            return list(pool.map(keep_priority(self._source_summary), content))
+
+    def _source_summary(self, item: Dict) -> Dict:
+        # Summarizing a source this short would not save any tokens
+        if self.packer.count([item]) <= SUMMARY_MAX_TOKENS or 'source' not in item:
+            return item
+
+        # The hash of the source as extracted, so what deduplication dropped from it does not count as a change
+        digest = item.get('content_hash') or content_hash(item)
+        summary = self.summaries.get_summary(self.model, item['type'], item['source'], digest)
+        if summary is None:
+            summary = self._summarize_chunk([item])
+            self.summaries.set_summary(self.model, item['type'], item['source'], digest, summary)
+        return {'title': f"Summary of {item['source']}", 'text': summary}
+
+    def _summarize_chunk(self, chunk: List[Dict]) -> str:
+        messages = [{
+            "role": "user",
+            "content": f"Summarize the key facts, opinions and quotes in this content for a blog writer. Be concise: {self.packer.pack(chunk)}"
+        }]
+        return self._complete(messages, max_tokens=SUMMARY_MAX_TOKENS)
+
+    def _complete(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        """Return a completion, from the cache when the same prompt was seen."""
+        key = self._cache_key(messages, max_tokens)
+        if self.use_cache:
+            cached = self.cache.get('generation', key)
+            if cached is not None:
+                return cached['text']
+
+        text = get_scheduler().call(
+            self.provider,
+            lambda: self._call(messages, max_tokens),
+            tokens=self._estimate_tokens(messages, max_tokens)
+        )
+        self.cache.set('generation', key, {'text': text})
+        return text
+
+    def _stream(self, messages: List[Dict]) -> Iterator[str]:
+        """Stream a completion; a cached one is returned in a single piece.
+
+        The provider's time to first token is recorded for hedged generation.
+        """
+        key = self._cache_key(messages, None)
+        if self.use_cache:
+            cached = self.cache.get('generation', key)
+            if cached is not None:
+                yield cached['text']
+                return
+
+        parts = []
+        stream = get_scheduler().stream(
+            self.provider,
+            lambda: self._call_stream(messages),
+            tokens=self._estimate_tokens(messages, None),
+            on_first=lambda seconds: get_latency_tracker().observe(self.provider, seconds)
+        )
+        for text in stream:
+            parts.append(text)
+            yield text
+        self.cache.set('generation', key, {'text': ''.join(parts)})
+
+    def _estimate_tokens(self, messages: List[Dict], max_tokens: Optional[int]) -> int:
+        """Tokens a call counts against the provider's budget: the prompt plus the completion allowed."""
+        prompt = sum(self.packer.counter.count(message['content']) for message in messages)
+        return prompt + (max_tokens or getattr(self, 'max_tokens', None) or DEFAULT_COMPLETION_TOKENS)
+
+    def _record_usage(self, input_tokens: int, output_tokens: int):
+        record_tokens(self.provider, input_tokens, output_tokens)
+        with self._usage_lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def _cache_key(self, messages: List[Dict], max_tokens: Optional[int]) -> str:
+        params = {
+            'provider': self.provider,
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'messages': messages,
+        }
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def _messages(self, combined_content: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def _call(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        raise NotImplementedError
+
+    def _call_stream(self, messages: List[Dict]) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class OpenAIBlogGenerator(BlogGenerator):
+    provider = 'openai'
+    name = 'OpenAI'
+    model = 'gpt-4'
+
+    def __init__(self, token_budget: Optional[int] = None, use_cache: bool = True, cache: Optional[ContentCache] = None, summaries: Optional[SummaryIndex] = None, client: Optional['OpenAI'] = None):
+        super().__init__(token_budget, use_cache, cache, summaries)
+        self.client = client or get_clients().openai()
+
+    def _messages(self, combined_content: str) -> List[Dict]:
+        """Build the chat messages for a blog post."""
+        return [
+            {"role": "system", "content": "You are a professional blog writer. Create a well-structured, engaging  blog post from the provided content."},
+            {"role": "user", "content": f"Create a blog post from this content: {combined_content}\n\nInclude images with alt text accurately describing what the image is all about. The blog should be formatted in markdown syntax"}
+        ]
+
+    def _call(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        params = {"max_tokens": max_tokens} if max_tokens else {}
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **params
+        )
+        if response.usage:
+            self._record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    def _call_stream(self, messages: List[Dict]) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            # The last chunk then carries the token usage
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage:
+                self._record_usage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+
+
+class ClaudeBlogGenerator(BlogGenerator):
+    provider = 'claude'
+    name = 'Claude'
+    model = 'claude-2'
+    max_tokens = 1000
+
+    def __init__(self, token_budget: Optional[int] = None, use_cache: bool = True, cache: Optional[ContentCache] = None, summaries: Optional[SummaryIndex] = None, client: Optional['Anthropic'] = None):
+        super().__init__(token_budget, use_cache, cache, summaries)
+        self.client = client or get_clients().anthropic()
+
+    def _messages(self, combined_content: str) -> List[Dict]:
+        """Build the messages for a blog post."""
+        return [{
+            "role": "user",
+            "content": f"Create a well-structured, engaging blog post from this content: {combined_content}\n\nInclude images with alt text accurately describing what the image is all about"
+        }]
+
+    def _call(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            messages=messages
+        )
+        self._record_usage(response.usage.input_tokens, response.usage.output_tokens)
+        return response.content[0].text
+
+    def _call_stream(self, messages: List[Dict]) -> Iterator[str]:
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=messages
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+            usage = stream.get_final_message().usage
+            self._record_usage(usage.input_tokens, usage.output_tokens)
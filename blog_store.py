@@ -0,0 +1,362 @@
+import gzip
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from cache import sqlite_connection
+from metrics import record_bytes, span
+
+BLOG_DIR = os.getenv("BLOG_DIR", "blogs")
+# Blogs returned per page by list() when no limit is given, and the most allowed
+BLOG_PAGE_SIZE = int(os.getenv("BLOG_PAGE_SIZE", "20"))
+BLOG_MAX_PAGE_SIZE = 100
+
+# Metadata columns, in the order they are stored; JSON columns are decoded on read
+_COLUMNS = (
+    'id', 'title', 'ai_model', 'model', 'urls', 'subreddits', 'errors', 'update_of',
+    'path', 'bytes', 'stored_bytes', 'timings', 'input_tokens', 'output_tokens', 'created_at',
+)
+_JSON_COLUMNS = ('urls', 'subreddits', 'errors', 'timings')
+
+
+_last_created = 0
+_last_created_lock = threading.Lock()
+
+
+def _created_at() -> datetime:
+    """Current UTC time, strictly later than the previous call's in this process.
+
+    UTC keeps ids in creation order when local clocks change for daylight saving.
+    """
+    global _last_created
+    with _last_created_lock:
+        _last_created = max(time.time_ns() // 1000, _last_created + 1)
+        seconds, micros = divmod(_last_created, 1_000_000)
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=micros)
+
+
+def new_blog_id(created: Optional[datetime] = None) -> str:
+    """Return a unique blog id that sorts by creation time (UTC), to the microsecond."""
+    created = created or _created_at()
+    return f"blog_{created.strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}"
+
+
+def blog_title(content: str) -> str:
+    """Title of a blog: its first Markdown heading, or its first line."""
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    for line in lines:
+        if line.startswith('#'):
+            return line.lstrip('#').strip()
+    return lines[0][:200] if lines else ''
+
+
+class BlogDraft:
+    """A blog being streamed, written to BLOG_DIR/drafts/<id>.md as it arrives.
+
+    If the stream is interrupted, the text generated so far stays on disk.
+    Once the finished blog is saved with save(draft=...), the draft is
+    removed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'x', encoding='utf-8')
+
+    def write(self, text: str):
+        self._file.write(text)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class BlogStore:
+    """Generated blogs, as gzipped Markdown files plus a SQLite index.
+
+    Content files live under BLOG_DIR/<year>/<month>/<id>.md.gz, so no
+    directory grows without bound. The index (BLOG_DIR/index.db, WAL mode,
+    shared by every process) holds each blog's metadata and a full-text
+    index of its title and content. save() only queues the write: a
+    background thread compresses and indexes blogs, and a blog can be read
+    back from memory until its write is done. Call close() (or flush())
+    before the process exits. Streamed blogs are written to a draft as
+    they are generated, so an interrupted stream is not lost.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or BLOG_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.db"
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple[Dict, str, Optional[BlogDraft]]] = {}
+        self._pending_lock = threading.Lock()
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        return sqlite_connection(self._local, self.index_path)
+
+    def _setup(self):
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blogs (
+                id TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                ai_model TEXT,
+                model TEXT,
+                urls TEXT NOT NULL,
+                subreddits TEXT NOT NULL,
+                errors TEXT NOT NULL,
+                update_of TEXT,
+                path TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                stored_bytes INTEGER NOT NULL,
+                timings TEXT NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        # Contentless, as the text itself is in the content files; without
+        # FTS5 in this SQLite build, search falls back to matching titles
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS blogs_fts USING fts5(title, content, content='')")
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+
+    def save(
+        self,
+        content: str,
+        title: Optional[str] = None,
+        ai_model: Optional[str] = None,
+        model: Optional[str] = None,
+        urls: Optional[List[str]] = None,
+        subreddits: Optional[List[str]] = None,
+        errors: Optional[List[Dict]] = None,
+        update_of: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        draft: Optional[BlogDraft] = None,
+    ) -> Dict:
+        """Queue a blog to be written and return its metadata, including its new id and path.
+
+        A draft the blog was streamed to is removed once the blog is written.
+        """
+        created = _created_at()
+        blog_id = new_blog_id(created)
+        record = {
+            'id': blog_id,
+            'title': title or blog_title(content),
+            'ai_model': ai_model,
+            'model': model,
+            'urls': list(urls or []),
+            'subreddits': list(subreddits or []),
+            'errors': list(errors or []),
+            'update_of': update_of,
+            'path': f"{created:%Y}/{created:%m}/{blog_id}.md.gz",
+            'bytes': len(content.encode()),
+            'stored_bytes': 0,
+            'timings': {stage: round(seconds, 3) for stage, seconds in (timings or {}).items()},
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'created_at': created.timestamp(),
+        }
+        with self._pending_lock:
+            self._pending[blog_id] = (record, content, draft)
+        self._start_writer()
+        self._writes.put(blog_id)
+        return dict(record)
+
+    def draft(self) -> BlogDraft:
+        """Start a draft to stream a blog to."""
+        return BlogDraft(self.directory / "drafts" / f"{new_blog_id()}.md")
+
+    def file_path(self, record: Dict) -> Path:
+        return self.directory / record['path']
+
+    def get(self, blog_id: str) -> Optional[Dict]:
+        """Return a blog's metadata, or None."""
+        with self._pending_lock:
+            if blog_id in self._pending:
+                return dict(self._pending[blog_id][0])
+        row = self._connection().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM blogs WHERE id = ?", (blog_id,)
+        ).fetchone()
+        return _record(row) if row else None
+
+    def read(self, blog_id: str) -> Optional[str]:
+        """Return a blog's Markdown content, or None."""
+        with self._pending_lock:
+            if blog_id in self._pending:
+                return self._pending[blog_id][1]
+        record = self.get(blog_id)
+        if record is None:
+            return None
+        with gzip.open(self.file_path(record), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def list(self, limit: Optional[int] = None, cursor: Optional[str] = None, query: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Return a page of blogs, newest first, and the cursor of the next page (None on the last).
+
+        query searches titles and content; every word must match. Pages are
+        keyed on the id of the last blog returned, so they stay stable
+        while new blogs are added.
+        """
+        limit = max(1, min(limit or BLOG_PAGE_SIZE, BLOG_MAX_PAGE_SIZE))
+        columns = ', '.join(f"b.{column}" for column in _COLUMNS)
+        sql = f"SELECT {columns} FROM blogs b"
+        where, params = [], []
+        if query and query.strip():
+            if self.full_text:
+                sql += " JOIN blogs_fts ON blogs_fts.rowid = b.rowid"
+                where.append("blogs_fts MATCH ?")
+                # Quote every word so user input is never read as FTS5 syntax
+                params.append(' '.join('"' + word.replace('"', '""') + '"' for word in query.split()))
+            else:
+                for word in query.split():
+                    where.append("b.title LIKE ?")
+                    params.append(f"%{word}%")
+        if cursor:
+            where.append("b.id < ?")
+            params.append(cursor)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY b.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        records = [_record(row) for row in rows[:limit]]
+        next_cursor = records[-1]['id'] if len(rows) > limit else None
+        return records, next_cursor
+
+    def flush(self):
+        """Wait until every queued blog is written."""
+        self._writes.join()
+
+    def close(self):
+        """Write the queued blogs and stop the writer thread."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join()
+
+    def import_files(self, directory: str) -> int:
+        """Add the Markdown files of a directory (the old blogs/blog_*.md) to the store.
+
+        Each keeps its file name as its id; files already imported are skipped.
+        """
+        imported = 0
+        for path in sorted(Path(directory).glob("*.md")):
+            if self.get(path.stem) is not None:
+                continue
+            content = path.read_text()
+            created = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+            record = {
+                'id': path.stem, 'title': blog_title(content), 'ai_model': None, 'model': None,
+                'urls': [], 'subreddits': [], 'errors': [], 'update_of': None,
+                'path': f"{created:%Y}/{created:%m}/{path.stem}.md.gz", 'bytes': len(content.encode()),
+                'stored_bytes': 0, 'timings': {}, 'input_tokens': 0, 'output_tokens': 0,
+                'created_at': created.timestamp(),
+            }
+            self._write(record, content)
+            imported += 1
+        return imported
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="blog-store", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            blog_id = self._writes.get()
+            try:
+                if blog_id is None:
+                    return
+                with self._pending_lock:
+                    record, content, draft = self._pending[blog_id]
+                try:
+                    self._write(record, content)
+                    if draft is not None:
+                        draft.discard()
+                    with self._pending_lock:
+                        del self._pending[blog_id]
+                except Exception as e:
+                    # The blog stays readable from memory for the life of the process
+                    print(f"Failed to save blog {blog_id}: {str(e)}")
+            finally:
+                self._writes.task_done()
+
+    def _write(self, record: Dict, content: str):
+        with span('save'):
+            path = self.file_path(record)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = gzip.compress(content.encode(), compresslevel=6)
+            with open(path, 'xb') as f:
+                f.write(data)
+            record = {**record, 'stored_bytes': len(data)}
+            record_bytes('save', len(data))
+
+            values = [json.dumps(record[column]) if column in _JSON_COLUMNS else record[column] for column in _COLUMNS]
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    f"INSERT INTO blogs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", values
+                )
+                if self.full_text:
+                    conn.execute(
+                        "INSERT INTO blogs_fts (rowid, title, content) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, record['title'], content)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                path.unlink(missing_ok=True)
+                raise
+
+
+def _record(row) -> Dict:
+    record = dict(zip(_COLUMNS, row))
+    for column in _JSON_COLUMNS:
+        record[column] = json.loads(record[column])
+    return record
+
+
+_store: Optional[BlogStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> BlogStore:
+    """Return the process-wide blog store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlogStore()
+        return _store
+
+
+def close_store():
+    """Write the queued blogs of the process-wide store; the next get_store() starts a new one."""
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        store.close()
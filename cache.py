@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from metrics import CACHE_REQUESTS
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# A hit only records its access time when the last one is older than this, so most hits do not write
+CACHE_TOUCH_INTERVAL = float(os.getenv("CACHE_TOUCH_INTERVAL", "60"))
+
+# Seconds an entry stays fresh, per kind of source. Kinds without a TTL never expire.
+CACHE_TTLS = {
+    'url': float(os.getenv("CACHE_TTL_URL", "3600")),
+    'reddit': float(os.getenv("CACHE_TTL_REDDIT", "300")),
+}
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so equivalent spellings share a cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or 'https'
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    # Drop tracking parameters and make the parameter order irrelevant
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_')
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def normalize_source(source_type: str, source: str) -> str:
+    """Normalize a URL or subreddit name into a stable cache key."""
+    source = source.strip()
+    if '://' in source:
+        return normalize_url(source)
+    if source_type == 'reddit':
+        source = source.lower()
+        for prefix in ('/r/', 'r/'):
+            if source.startswith(prefix):
+                source = source[len(prefix):]
+        return source.strip('/')
+    return source
+
+
+def sqlite_connection(local: threading.local, path: Path, row_factory=None, synchronous: str = "NORMAL") -> sqlite3.Connection:
+    """Return this thread's connection to a SQLite file in WAL mode, opening it on first use.
+
+    sqlite3 connections cannot be shared between threads, so each thread
+    keeps its own in local. Writes are left to explicit transactions.
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = row_factory
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        local.conn = conn
+    return conn
+
+
+class ContentCache:
+    """On-disk cache of extracted content, shared by the CLI, TUI and API.
+
+    Entries live in SQLite (WAL mode), so several processes can read and write
+    the same cache. The total size is capped and the least recently used
+    entries are evicted first. The total is kept in a meta row, updated in
+    the same transaction as the entries, so a write does not sum every entry.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = CACHE_MAX_BYTES, ttls: Optional[Dict[str, float]] = None):
+        self.path = Path(path or Path(CACHE_DIR) / "content.db")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self._local = threading.local()
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        return sqlite_connection(self._local, self.path)
+
+    def _setup(self):
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (name, value) SELECT 'size', COALESCE(SUM(size), 0) FROM entries;
+        """)
+
+    @staticmethod
+    def make_key(kind: str, source: str) -> str:
+        return hashlib.sha256(f"{kind}:{normalize_source(kind, source)}".encode()).hexdigest()
+
+    def get(self, kind: str, source: str) -> Optional[Dict]:
+        """Return the cached value for a source, or None when missing or expired."""
+        key = self.make_key(kind, source)
+        conn = self._connection()
+        row = conn.execute("SELECT value, created_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        ttl = self.ttls.get(kind)
+        if row is None or (ttl is not None and now - row[1] > ttl):
+            self.misses[kind] += 1
+            CACHE_REQUESTS.inc(kind=kind, result='miss')
+            return None
+
+        if now - row[2] > CACHE_TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits[kind] += 1
+        CACHE_REQUESTS.inc(kind=kind, result='hit')
+        return json.loads(row[0])
+
+    def set(self, kind: str, source: str, value: Dict):
+        """Store a value and evict least recently used entries over the size cap."""
+        data = json.dumps(value).encode()
+        key = self.make_key(kind, source)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            replaced = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, data, len(data), now, now)
+            )
+            self._add_size(conn, len(data) - (replaced[0] if replaced else 0))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _size(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM meta WHERE name = 'size'").fetchone()[0]
+
+    @staticmethod
+    def _add_size(conn: sqlite3.Connection, delta: int):
+        conn.execute("UPDATE meta SET value = value + ? WHERE name = 'size'", (delta,))
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete least recently used entries until the cache fits; runs inside set's transaction."""
+        total = self._size(conn)
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total - freed <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            freed += size
+        self._add_size(conn, -freed)
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE meta SET value = 0 WHERE name = 'size'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this process and the current cache size."""
+        conn = self._connection()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = self._size(conn)
+        return {
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'entries': entries,
+            'bytes': size,
+        }
+
+
+_cache: Optional[ContentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ContentCache:
+    """Return the process-wide content cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ContentCache()
+        return _cache
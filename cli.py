@@ -1,83 +1,198 @@
-import click                                                                                                                                                                                                                              
-import os
-from datetime import datetime
-from pathlib import Path
-from dotenv import load_dotenv
-from trogon import tui
-from scraper import WebScraper
-from reddit_parser import RedditParser
-from blog_generator import OpenAIBlogGenerator, ClaudeBlogGenerator
-from image_processor import ImageProcessor
-
-
-load_dotenv()
-
-@tui()
-@click.command()                                                                                                           
-@click.option('--urls', '-u', multiple=True, help='List of website URLs to scrape')                                        
-@click.option('--subreddits', '-s', multiple=True, help='List of subreddits or Reddit post URLs')                          
-@click.option('--ai-model', '-m', type=click.Choice(['openai', 'claude']), default='openai', help='Choose AI model for blog generation')                                                                  
-def create_blog(urls, subreddits, ai_model):                                                                               
-    """Create a blog from website URLs and Reddit content."""                                                              
-
-    # Initialize components                                                                                                
-    web_scraper = WebScraper()                                                                                             
-    reddit_parser = RedditParser()                                                                                         
-    image_processor = ImageProcessor()                                                                                     
-
-    content = []                                                                                                           
-
-    # Process website URLs
-    if urls:
-        for url in urls:                                                                                                   
-            try:                                                                                                           
-                scraped_content = web_scraper.scrape(url)                                                                  
-                content.append(scraped_content)                                                                            
-            except Exception as e:                                                                                         
-                click.echo(f"Error scraping {url}: {str(e)}")                                                              
-                                                                                                                            
-    # Process Reddit content                                                                                               
-    if subreddits:                                                                                                         
-        for subreddit in subreddits:                                                                                       
-            try:                                                                                                           
-                reddit_content = reddit_parser.parse(subreddit)                                                            
-                content.append(reddit_content)                                                                             
-            except Exception as e:                                                                                         
-                click.echo(f"Error parsing Reddit content {subreddit}: {str(e)}")                                          
-                                                                                                                            
-    if not content:                                                                                                        
-        click.echo("No content was successfully scraped or parsed.")                                                       
-        return                                                                                                             
-
-    # Process images and generate alt text                                                                                 
-    processed_content = image_processor.process_images(content)                                                            
-
-    # Generate blog using selected AI model                                                                                
-    if ai_model == 'openai':                                                                                               
-        generator = OpenAIBlogGenerator()                                                                                  
-    else:                                                                                                                  
-        generator = ClaudeBlogGenerator()                                                                                  
-
-    try:                                                                                                                   
-        blog_content = generator.generate(processed_content)
-        
-        # Create blogs directory if it doesn't exist
-        blogs_dir = Path("blogs")
-        blogs_dir.mkdir(exist_ok=True)
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"blog_{timestamp}.md"
-        filepath = blogs_dir / filename
-        
-        # Save blog content to file
-        with open(filepath, "w") as f:
-            f.write(blog_content)
-            
-        click.echo("Blog generated successfully!")                                                                         
-        click.echo(f"\nBlog saved to: {filepath}")
-    except Exception as e:                                                                                                 
-        click.echo(f"Error generating blog: {str(e)}")                                                                     
-                                                                                                                            
-if __name__ == '__main__':                                                                                                 
-    create_blog()
+import click
+
+# Only click is imported up front so `--help` and the TUI start quickly. Each
+# stage imports its modules, and with them the provider SDKs, when it runs:
+# praw only for subreddits, and only the SDK of the selected AI model.
+
+
+@click.group()
+def cli():
+    """Create blogs from website URLs and Reddit content."""
+
+@cli.command('create-blog')
+@click.option('--urls', '-u', multiple=True, help='List of website URLs to scrape')
+@click.option('--subreddits', '-s', multiple=True, help='List of subreddits or Reddit post URLs')
+@click.option('--ai-model', '-m', type=click.Choice(['openai', 'claude', 'hedged', 'auto']), default='openai', help='Choose AI model for blog generation')
+@click.option('--no-cache', is_flag=True, help='Fetch every source again instead of using the content cache')
+@click.option('--warm-cache', is_flag=True, help='Only fetch the sources into the content cache, without generating a blog')
+@click.option('--stream', is_flag=True, help='Print the blog while it is being generated')
+@click.option('--fresh', is_flag=True, help='Generate a new blog even if the same sources and model were used before')
+@click.option('--profile', is_flag=True, help='Print the time, bytes and tokens spent in each stage')
+def create_blog(urls, subreddits, ai_model, no_cache=False, warm_cache=False, stream=False, fresh=False, profile=False):
+    """Create a blog from website URLs and Reddit content."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    from blog_store import close_store
+    from clients import close_clients
+
+    try:
+        _create_blog(urls, subreddits, ai_model, no_cache, warm_cache, stream, fresh)
+    finally:
+        # Wait for the blog to be written, then close the shared provider clients
+        close_store()
+        close_clients()
+        if profile:
+            print_profile()
+
+def _create_blog(urls, subreddits, ai_model, no_cache, warm_cache, stream, fresh):
+    if warm_cache:
+        import asyncio
+        from cache import get_cache
+        from ingestion import ingest_sources
+
+        # Fetch all website URLs and Reddit content concurrently, into the cache only
+        content, errors = asyncio.run(ingest_sources(urls, subreddits, use_cache=not no_cache))
+        for error in errors:
+            click.echo(error['error'])
+        stats = get_cache().stats()
+        click.echo(f"Cached {len(content)} source(s). Cache now holds {stats['entries']} entries ({stats['bytes']} bytes).")
+        return
+
+    from pipeline import run_pipeline
+
+    try:
+        result = run_pipeline(
+            list(urls),
+            list(subreddits),
+            ai_model=ai_model,
+            use_cache=not no_cache,
+            fresh=fresh,
+            on_source=_echo_source_error,
+            on_token=(lambda text: click.echo(text, nl=False)) if stream else None,
+        )
+        if stream:
+            click.echo()
+        click.echo("Blog generated successfully!")
+        click.echo(f"\nBlog saved to: {result['filename']}")
+        click.echo(f"Update it later with: python cli.py update-blog {result['blog_id']}")
+    except Exception as e:
+        click.echo(f"Error generating blog: {str(e)}")
+
+def _echo_source_error(source_type, source, error):
+    if error:
+        click.echo(error['error'])
+
+@cli.command('update-blog')
+@click.argument('blog_id')
+@click.option('--urls', '-u', multiple=True, help='Website URLs to add to the blog\'s sources')
+@click.option('--subreddits', '-s', multiple=True, help='Subreddits or Reddit post URLs to add to the blog\'s sources')
+@click.option('--ai-model', '-m', type=click.Choice(['openai', 'claude', 'hedged', 'auto']), default=None, help='AI model (default: the one the blog was created with)')
+@click.option('--no-cache', is_flag=True, help='Fetch every source again instead of using the content cache')
+@click.option('--stream', is_flag=True, help='Print the blog while it is being generated')
+@click.option('--fresh', is_flag=True, help='Generate a new blog even if no source changed')
+@click.option('--profile', is_flag=True, help='Print the time, bytes and tokens spent in each stage')
+def update_blog(blog_id, urls, subreddits, ai_model, no_cache=False, stream=False, fresh=False, profile=False):
+    """Regenerate a blog from its sources, summarizing only the ones that changed.
+
+    Every source is fetched again, and each one is summarized on its own;
+    sources whose content is unchanged since the last run reuse their
+    summary, so the new blog costs tokens in proportion to what changed.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    from blog_store import close_store, get_store
+    from clients import close_clients
+    from pipeline import run_pipeline
+
+    previous = get_store().get(blog_id)
+    if previous is None:
+        click.echo(f"Blog {blog_id} not found.")
+        return
+
+    try:
+        result = run_pipeline(
+            list(urls),
+            list(subreddits),
+            ai_model=ai_model or previous['ai_model'],
+            use_cache=not no_cache,
+            fresh=fresh,
+            on_source=_echo_source_error,
+            on_token=(lambda text: click.echo(text, nl=False)) if stream else None,
+            update=blog_id,
+        )
+        if stream:
+            click.echo()
+        click.echo("Blog updated successfully!")
+        click.echo(f"\nBlog saved to: {result['filename']}")
+        click.echo(f"Update it later with: python cli.py update-blog {result['blog_id']}")
+    except Exception as e:
+        click.echo(f"Error updating blog: {str(e)}")
+    finally:
+        close_store()
+        close_clients()
+        if profile:
+            print_profile()
+
+def print_profile():
+    """Print the per-stage breakdown collected while the blog was created."""
+    from metrics import stage_breakdown, token_totals
+
+    click.echo("\nStage       Calls  Errors   Seconds         Bytes", err=True)
+    for row in stage_breakdown():
+        click.echo(f"{row['stage']:<10} {row['calls']:>6} {row['errors']:>7} {row['seconds']:>9.3f} {row['bytes']:>13,}", err=True)
+    for (provider, direction), tokens in sorted(token_totals().items()):
+        click.echo(f"{provider} {direction} tokens: {tokens:,}", err=True)
+
+@cli.command('batch')
+@click.argument('jobs_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='Result JSONL, also used to resume (default: <jobs file>.results.jsonl)')
+@click.option('--workers', '-w', type=int, default=None, help='Jobs run at the same time (default: BATCH_WORKERS, 4)')
+@click.option('--ai-model', '-m', type=click.Choice(['openai', 'claude', 'hedged', 'auto']), default=None, help='AI model for jobs that do not name one')
+@click.option('--profile', is_flag=True, help='Print the time, bytes and tokens spent in each stage')
+def batch(jobs_file, output, workers, ai_model, profile=False):
+    """Create a blog for every job in a JSONL file.
+
+    Each line is a JSON object shaped like the API's request body, with an
+    optional 'id'. Results are appended to the output file as jobs finish;
+    running the same command again skips the jobs already completed.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    from batch import BATCH_WORKERS, run_batch
+    from blog_store import close_store
+    from clients import close_clients
+
+    output = output or f"{jobs_file.rsplit('.', 1)[0]}.results.jsonl"
+
+    def report(result):
+        detail = result.get('filename') or (result.get('error') or 'unknown error').splitlines()[0]
+        click.echo(f"{result['id']}: {result['status']} in {result['seconds']:.1f}s - {detail}", err=True)
+
+    try:
+        counts = run_batch(jobs_file, output, workers=workers or BATCH_WORKERS, ai_model=ai_model, on_result=report)
+        click.echo(f"Completed {counts.get('completed', 0)}, failed {counts.get('failed', 0)}, "
+                   f"skipped {counts.get('skipped', 0)} already completed. Results in {output}")
+    except KeyboardInterrupt:
+        click.echo(f"Interrupted. Run the same command again to resume from {output}", err=True)
+    finally:
+        close_store()
+        close_clients()
+        if profile:
+            print_profile()
+
+@cli.command('import-blogs')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False), default='blogs')
+def import_blogs(directory):
+    """Add the Markdown files of DIRECTORY (default: blogs) to the blog store.
+
+    For blogs written before the blog store existed; each keeps its file
+    name as its id. The original files are left in place.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    from blog_store import close_store, get_store
+
+    try:
+        click.echo(f"Imported {get_store().import_files(directory)} blog(s).")
+    finally:
+        close_store()
+
+@cli.command('tui')
+@click.pass_context
+def open_tui(ctx):
+    """Open Textual TUI."""
+    from trogon import Trogon
+    Trogon(cli, command_name='tui', click_context=ctx).run()
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,199 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, List, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+if TYPE_CHECKING:
+    import httpx
+
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "15"))
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "50"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "600"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Retries are left to the scheduler in ratelimit.py, which shares backoff across calls
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+REDDIT_TIMEOUT = float(os.getenv("REDDIT_TIMEOUT", "16"))
+# Open a connection to every provider at startup, so the first request skips the TLS handshake
+CLIENT_WARM_CONNECTIONS = os.getenv("CLIENT_WARM_CONNECTIONS", "1") == "1"
+# Seconds to wait for each of those connections, so an unreachable provider cannot hold up startup
+CLIENT_WARM_TIMEOUT = float(os.getenv("CLIENT_WARM_TIMEOUT", "5"))
+
+
+class ClientPool:
+    """Provider clients shared by every request of a process.
+
+    Each client is created on first use (or by warm()) and keeps its
+    connection pool, TLS sessions and auth state until close(). The HTTP,
+    OpenAI and Anthropic clients are safe to use from several threads and
+    are shared; praw.Reddit is not, so each thread gets its own Reddit
+    client. The SDKs themselves are imported on first use too, so a
+    process only loads the providers it talks to.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Every thread's Reddit client, to close them; a close() starts a new generation
+        self._reddits: List[object] = []
+        self._generation = 0
+
+    def http(self) -> 'httpx.Client':
+        """Pooled HTTP client for scraping pages and downloading images."""
+        def create():
+            import httpx
+
+            # httpx negotiates gzip/deflate, and brotli when a brotli package
+            # is installed; HTTP/2 needs the optional h2 package.
+            return httpx.Client(
+                http2=find_spec("h2") is not None,
+                timeout=SCRAPER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=SCRAPER_MAX_CONNECTIONS,
+                    max_keepalive_connections=SCRAPER_MAX_CONNECTIONS,
+                ),
+                follow_redirects=True,
+                headers={"User-Agent": "ai-blog-writer/1.0"},
+            )
+        return self._get('http', create)
+
+    def openai(self):
+        def create():
+            from openai import OpenAI
+            return OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=LLM_MAX_RETRIES,
+                http_client=self._llm_http_client(),
+            )
+        return self._get('openai', create)
+
+    def anthropic(self):
+        def create():
+            from anthropic import Anthropic
+            return Anthropic(
+                api_key=os.getenv('CLAUDE_API_KEY'),
+                max_retries=LLM_MAX_RETRIES,
+                http_client=self._llm_http_client(),
+            )
+        return self._get('anthropic', create)
+
+    def reddit(self):
+        """This thread's Reddit client."""
+        generation, client = getattr(self._local, 'reddit', (None, None))
+        if client is None or generation != self._generation:
+            client = self._create_reddit()
+            with self._lock:
+                self._reddits.append(client)
+                self._local.reddit = (self._generation, client)
+        return client
+
+    def _create_reddit(self):
+        import praw
+        import requests
+
+        # A thread makes one Reddit call at a time, so one keep-alive connection is enough
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        endpoints = {}
+        if os.getenv("REDDIT_OAUTH_URL"):
+            endpoints['oauth_url'] = os.getenv("REDDIT_OAUTH_URL")
+        if os.getenv("REDDIT_URL"):
+            endpoints['reddit_url'] = os.getenv("REDDIT_URL")
+        # You'll need to set up your Reddit API credentials
+        return praw.Reddit(
+            client_id=os.getenv("REDDIT_CLIENT_ID", "YOUR_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET", "YOUR_CLIENT_SECRET"),
+            user_agent=os.getenv("REDDIT_USER_AGENT", "ai-blog-writer/1.0"),
+            timeout=REDDIT_TIMEOUT,
+            requestor_kwargs={'session': session},
+            **endpoints
+        )
+
+    def warm(self):
+        """Create every client and, with CLIENT_WARM_CONNECTIONS, connect to each provider."""
+        factories = {'http': self.http, 'openai': self.openai, 'anthropic': self.anthropic, 'reddit': self.reddit}
+        for name, factory in factories.items():
+            try:
+                factory()
+            except Exception as e:
+                print(f"Failed to create {name} client: {str(e)}")
+
+        if CLIENT_WARM_CONNECTIONS:
+            # The Reddit client warmed is this thread's
+            clients = [(name, self._clients.get(name)) for name in ('openai', 'anthropic')]
+            clients.append(('reddit', getattr(self._local, 'reddit', (None, None))[1]))
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                list(pool.map(lambda args: self._connect(*args), clients))
+
+    def close(self):
+        """Close every client and its connections."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            reddits, self._reddits = self._reddits, []
+            self._generation += 1
+        for name, client in [*clients.items(), *(('reddit', reddit) for reddit in reddits)]:
+            try:
+                if name == 'reddit':
+                    client._core._requestor._http.close()
+                else:
+                    client.close()
+            except Exception as e:
+                print(f"Failed to close {name} client: {str(e)}")
+
+    def _get(self, name: str, create):
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                client = self._clients[name] = create()
+            return client
+
+    def _llm_http_client(self) -> 'httpx.Client':
+        import httpx
+
+        return httpx.Client(
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+        )
+
+    def _connect(self, name: str, client):
+        """Open a keep-alive connection to a provider; the response itself is ignored."""
+        if client is None:
+            return
+        try:
+            if name == 'reddit':
+                client._core._requestor._http.head(client.config.oauth_url, timeout=CLIENT_WARM_TIMEOUT)
+            else:
+                client._client.head(str(client.base_url), timeout=CLIENT_WARM_TIMEOUT)
+        except Exception:
+            pass
+
+
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_clients() -> ClientPool:
+    """Return the process-wide client pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
+
+
+def close_clients():
+    """Close the process-wide client pool; the next get_clients() starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
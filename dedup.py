@@ -0,0 +1,255 @@
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from cache import CACHE_DIR, normalize_url, sqlite_connection
+from metrics import REGISTRY, span
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+# Paragraphs and comments at least this similar (estimated Jaccard of their word 3-grams) are near-duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# Shorter paragraphs and comments are only dropped when repeated exactly
+DEDUP_MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "8"))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", str(Path(CACHE_DIR) / "boilerplate.db"))
+# A paragraph seen on this many pages of a site is boilerplate (cookie notices, newsletter prompts)
+DEDUP_BOILERPLATE_MIN_PAGES = int(os.getenv("DEDUP_BOILERPLATE_MIN_PAGES", "3"))
+# Longer paragraphs are article text rather than boilerplate, and are not indexed
+DEDUP_BOILERPLATE_MAX_CHARS = int(os.getenv("DEDUP_BOILERPLATE_MAX_CHARS", "200"))
+# Pages not scraped again for this many days drop out of the boilerplate index
+DEDUP_BOILERPLATE_TTL_DAYS = float(os.getenv("DEDUP_BOILERPLATE_TTL_DAYS", "30"))
+
+DEDUP_REMOVED = REGISTRY.counter(
+    'blog_dedup_removed_total', 'Paragraphs and comments dropped before prompting, by reason', ('reason',))
+DEDUP_REMOVED_CHARS = REGISTRY.counter(
+    'blog_dedup_removed_chars_total', 'Characters dropped before prompting, by reason', ('reason',))
+
+# MinHash signatures of 64 values, split into 16 bands of 4 for locality-sensitive hashing.
+# Two paragraphs share a band with probability 1 - (1 - J^4)^16: 99.9% at J=0.8, 3% at J=0.2.
+_PERMUTATIONS = 64
+_BANDS = 16
+_ROWS = _PERMUTATIONS // _BANDS
+_HASH_MASK = (1 << 64) - 1
+_EMPTY = 1 << 64
+# For each bin, the order in which other bins are tried when it is empty
+_random = random.Random(0)
+_PROBES = [_random.sample(range(_PERMUTATIONS), _PERMUTATIONS) for _ in range(_PERMUTATIONS)]
+_WORD = re.compile(r"\w+")
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def fingerprint(text: str) -> str:
+    """Stable hash of a paragraph, ignoring case, punctuation and spacing."""
+    return _fingerprint(words(text))
+
+
+def _fingerprint(tokens: List[str]) -> str:
+    return hashlib.blake2b(' '.join(tokens).encode(), digest_size=8).hexdigest()
+
+
+def _shingle_hash(shingle) -> int:
+    # Not hash(), which differs between processes, so signatures and what is dropped do not
+    return int.from_bytes(hashlib.blake2b(' '.join(shingle).encode(), digest_size=8).digest(), 'big')
+
+
+def minhash(tokens: List[str]) -> Tuple[int, ...]:
+    """MinHash signature of the word 3-grams of a paragraph.
+
+    Uses one-permutation hashing: each 3-gram is hashed once, the low bits
+    of its hash pick one of the 64 bins and each bin keeps its smallest
+    hash. Bins no 3-gram fell into borrow the value of another bin, tried
+    in a fixed order per bin, so equal paragraphs still agree on them.
+    """
+    if len(tokens) < 3:
+        shingles = {_shingle_hash(tokens)}
+    else:
+        shingles = {_shingle_hash(shingle) for shingle in zip(tokens, tokens[1:], tokens[2:])}
+
+    bins = [_EMPTY] * _PERMUTATIONS
+    for value in shingles:
+        index = value & (_PERMUTATIONS - 1)
+        if value < bins[index]:
+            bins[index] = value
+    if _EMPTY in bins:
+        hashed = tuple(bins)
+        for i, value in enumerate(hashed):
+            if value == _EMPTY:
+                for j in _PROBES[i]:
+                    if hashed[j] != _EMPTY:
+                        bins[i] = hashed[j]
+                        break
+    return tuple(bins)
+
+
+class NearDuplicates:
+    """Remembers paragraphs and tells whether a new one repeats one already seen.
+
+    Exact repeats are found by fingerprint. Near-duplicates are found with
+    MinHash and LSH banding: a paragraph is only compared with the ones
+    sharing a band of its signature, so each check takes roughly constant
+    time and a whole request stays linear in the size of its content.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, min_words: int = DEDUP_MIN_WORDS):
+        self.threshold = threshold
+        self.min_words = min_words
+        self.fingerprints: Set[str] = set()
+        self.signatures: List[Tuple[int, ...]] = []
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    def check(self, text: str) -> Optional[str]:
+        """Return 'exact' or 'near' if text repeats a paragraph seen before, else remember it and return None."""
+        tokens = words(text)
+        key = _fingerprint(tokens)
+        if key in self.fingerprints:
+            return 'exact'
+        self.fingerprints.add(key)
+        if len(tokens) < self.min_words:
+            return None
+
+        signature = minhash(tokens)
+        bands = [(band, signature[band * _ROWS:(band + 1) * _ROWS]) for band in range(_BANDS)]
+        candidates = set()
+        for band in bands:
+            candidates.update(self.buckets.get(band, ()))
+        for candidate in candidates:
+            other = self.signatures[candidate]
+            if sum(a == b for a, b in zip(signature, other)) >= self.threshold * _PERMUTATIONS:
+                return 'near'
+
+        self.signatures.append(signature)
+        for band in bands:
+            self.buckets.setdefault(band, []).append(len(self.signatures) - 1)
+        return None
+
+
+class BoilerplateIndex:
+    """Short paragraphs seen per page of each site, across every scrape.
+
+    A paragraph found on DEDUP_BOILERPLATE_MIN_PAGES different pages of a
+    site is boilerplate. The index is kept in SQLite next to the content
+    cache and shared by every process.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_pages: int = DEDUP_BOILERPLATE_MIN_PAGES):
+        self.path = Path(path or DEDUP_INDEX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.min_pages = min_pages
+        self._local = threading.local()
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        return sqlite_connection(self._local, self.path)
+
+    def _setup(self):
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS paragraphs (
+                site TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                page TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (site, fingerprint, page)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS paragraphs_seen_at ON paragraphs (seen_at);
+        """)
+        conn.execute("DELETE FROM paragraphs WHERE seen_at < ?", (time.time() - DEDUP_BOILERPLATE_TTL_DAYS * 86400,))
+
+    def observe(self, url: str, paragraphs: Iterable[str]) -> Set[str]:
+        """Record the short paragraphs of a page; return the fingerprints of those that are boilerplate."""
+        page = normalize_url(url)
+        site = urlsplit(page).hostname or ''
+        fingerprints = sorted({fingerprint(p) for p in paragraphs if len(p) <= DEDUP_BOILERPLATE_MAX_CHARS})
+        if not fingerprints:
+            return set()
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO paragraphs (site, fingerprint, page, seen_at) VALUES (?, ?, ?, ?)",
+                [(site, fp, page, now) for fp in fingerprints]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        boilerplate = set()
+        # Stay well below SQLite's limit on query parameters
+        for start in range(0, len(fingerprints), 500):
+            batch = fingerprints[start:start + 500]
+            rows = conn.execute(
+                f"SELECT fingerprint FROM paragraphs WHERE site = ? AND fingerprint IN ({', '.join('?' * len(batch))}) "
+                "GROUP BY fingerprint HAVING COUNT(*) >= ?",
+                [site, *batch, self.min_pages]
+            ).fetchall()
+            boilerplate.update(row[0] for row in rows)
+        return boilerplate
+
+
+def deduplicate(content: List[Dict], boilerplate: Optional[BoilerplateIndex] = None) -> List[Dict]:
+    """Drop repeated paragraphs and comments across all sources, and boilerplate of web pages.
+
+    Sources are visited in order and the first copy of a paragraph is kept.
+    Titles and images are left alone. Returns new source dicts; the ones
+    given are not changed.
+    """
+    if not DEDUP_ENABLED:
+        return content
+    boilerplate = boilerplate or get_boilerplate_index()
+
+    with span('dedup'):
+        seen = NearDuplicates()
+        removed: Counter = Counter()
+        removed_chars: Counter = Counter()
+
+        def keep(text: str, known_boilerplate: Set[str]) -> bool:
+            if known_boilerplate and fingerprint(text) in known_boilerplate:
+                reason = 'boilerplate'
+            else:
+                reason = seen.check(text)
+            if reason:
+                removed[reason] += 1
+                removed_chars[reason] += len(text)
+            return reason is None
+
+        result = []
+        for item in content:
+            item = dict(item)
+            paragraphs = [p.strip() for p in (item.get('text') or '').split('\n') if p.strip()]
+            known_boilerplate = set()
+            if item.get('type') == 'url' and item.get('source'):
+                known_boilerplate = boilerplate.observe(item['source'], paragraphs)
+            item['text'] = '\n'.join(p for p in paragraphs if keep(p, known_boilerplate))
+            if 'comments' in item:
+                item['comments'] = [c for c in item['comments'] if c.strip() and keep(c, set())]
+            result.append(item)
+
+        for reason, count in removed.items():
+            DEDUP_REMOVED.inc(count, reason=reason)
+            DEDUP_REMOVED_CHARS.inc(removed_chars[reason], reason=reason)
+        return result
+
+
+_index: Optional[BoilerplateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_boilerplate_index() -> BoilerplateIndex:
+    """Return the process-wide boilerplate index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BoilerplateIndex()
+        return _index
@@ -0,0 +1,263 @@
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+EXTRACT_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", str(5 * 1024 * 1024)))
+EXTRACT_MAX_TEXT_CHARS = int(os.getenv("EXTRACT_MAX_TEXT_CHARS", "100000"))
+
+# Tags that implicitly close an open <p> in HTML
+_CLOSES_PARAGRAPH = {
+    'p', 'div', 'ul', 'ol', 'dl', 'table', 'section', 'article', 'main', 'aside',
+    'header', 'footer', 'nav', 'blockquote', 'pre', 'form', 'hr', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+}
+_SKIP_TEXT = {'script', 'style', 'noscript', 'template'}
+
+# Without a charset in the response, a <meta charset> is looked for in this much of the page, as browsers do
+_SNIFF_BYTES = 1024
+# Matches both <meta charset="..."> and <meta http-equiv="Content-Type" content="...; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+# Labels browsers read as another encoding: a page that declares UTF-16 in ASCII is not UTF-16,
+# and Latin-1 pages routinely use the Windows-1252 quotes and dashes
+_ENCODING_OVERRIDES = {
+    'utf-16': 'utf-8', 'utf-16-le': 'utf-8', 'utf-16-be': 'utf-8',
+    'iso8859-1': 'cp1252', 'ascii': 'cp1252',
+}
+
+
+def sniff_encoding(head: bytes) -> str:
+    """Encoding of a page from its byte order mark or <meta charset>, UTF-8 when it declares none."""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    match = _META_CHARSET.search(head)
+    if match:
+        try:
+            name = codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            return 'utf-8'
+        return _ENCODING_OVERRIDES.get(name, name)
+    return 'utf-8'
+
+
+class _Collector:
+    """Collects title, paragraphs and images from parser events in one pass.
+
+    Paragraphs are kept for the first <main>, the first <article> and the
+    whole page, so the result matches picking main, then article, then body.
+    """
+
+    def __init__(self, max_text_chars: int):
+        self.max_text_chars = max_text_chars
+        self.title: Optional[str] = None
+        self.images: List[Dict] = []
+        self.paragraphs = {'main': [], 'article': [], 'body': []}
+        self.lengths = {'main': 0, 'article': 0, 'body': 0}
+        # 0: not seen yet, 1: inside the first one, 2: the first one has closed
+        self.state = {'main': 0, 'article': 0}
+        self.depth = {'main': 0, 'article': 0}
+
+    def start(self, tag: str, attrs: Dict[str, str]):
+        if tag in self.state:
+            if self.state[tag] == 0:
+                self.state[tag] = 1
+            if self.state[tag] == 1:
+                self.depth[tag] += 1
+        elif tag == 'img' and attrs.get('src'):
+            self.images.append({
+                'url': attrs['src'],
+                'current_alt': attrs.get('alt') or '',
+            })
+
+    def end(self, tag: str):
+        if tag in self.state and self.state[tag] == 1:
+            self.depth[tag] -= 1
+            if self.depth[tag] == 0:
+                self.state[tag] = 2
+
+    def paragraph(self, text: str):
+        text = text.strip()
+        for scope in ('main', 'article'):
+            if self.state[scope] == 1:
+                self.paragraphs[scope].append(text)
+                self.lengths[scope] += len(text) + 1
+        self.paragraphs['body'].append(text)
+        self.lengths['body'] += len(text) + 1
+
+    def _scope(self) -> str:
+        if self.state['main']:
+            return 'main'
+        if self.state['article']:
+            return 'article'
+        return 'body'
+
+    @property
+    def done(self) -> bool:
+        # A <main> appearing after the limit was reached is not looked for
+        return self.lengths[self._scope()] >= self.max_text_chars
+
+    def result(self) -> Dict:
+        return {
+            'title': self.title or '',
+            # One paragraph per line, so later stages can tell paragraphs apart
+            'text': '\n'.join(self.paragraphs[self._scope()]),
+            'images': self.images,
+        }
+
+
+class _StdlibParser(HTMLParser):
+    """Incremental extractor on top of the standard library HTML parser."""
+
+    def __init__(self, collector: _Collector, encoding: Optional[str]):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+        # Without an encoding, the start of the page is held back until its <meta charset> is known
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if encoding else None
+        self.head = b''
+        self.in_title = False
+        self.title_parts: List[str] = []
+        self.paragraph: Optional[List[str]] = None
+        self.skip_depth = 0
+
+    def feed_bytes(self, data: bytes):
+        if self.decoder is None:
+            self.head += data
+            if len(self.head) < _SNIFF_BYTES:
+                return
+            data = self._sniff()
+        self.feed(self.decoder.decode(data))
+
+    def finish(self):
+        data = self._sniff() if self.decoder is None else b''
+        self.feed(self.decoder.decode(data, final=True))
+        self.close()
+        self._close_paragraph()
+
+    def _sniff(self) -> bytes:
+        data, self.head = self.head, b''
+        self.decoder = codecs.getincrementaldecoder(sniff_encoding(data))(errors='replace')
+        return data
+
+    def _close_paragraph(self):
+        if self.paragraph is not None:
+            self.collector.paragraph(''.join(self.paragraph))
+            self.paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _CLOSES_PARAGRAPH:
+            self._close_paragraph()
+        if tag in _SKIP_TEXT:
+            self.skip_depth += 1
+        elif tag == 'title' and self.collector.title is None:
+            self.in_title = True
+        elif tag == 'p':
+            self.paragraph = []
+        self.collector.start(tag, {name: value for name, value in attrs if value is not None})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ('img', 'br', 'hr'):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TEXT:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == 'title' and self.in_title:
+            self.in_title = False
+            self.collector.title = ''.join(self.title_parts)
+        elif tag in ('p', 'main', 'article', 'body', 'html'):
+            self._close_paragraph()
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.in_title:
+            self.title_parts.append(data)
+        if self.paragraph is not None:
+            self.paragraph.append(data)
+
+
+class _LxmlParser:
+    """Incremental extractor on top of lxml's pull parser."""
+
+    def __init__(self, collector: _Collector, encoding: Optional[str]):
+        self.collector = collector
+        self.parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding, remove_comments=True)
+
+    def feed_bytes(self, data: bytes):
+        self.parser.feed(data)
+        self._drain()
+
+    def finish(self):
+        self.parser.close()
+        self._drain()
+
+    def _drain(self):
+        for event, element in self.parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+            if event == 'start':
+                self.collector.start(tag, dict(element.attrib))
+                continue
+
+            if tag == 'title' and self.collector.title is None:
+                self.collector.title = element.text or ''
+            elif tag == 'p':
+                self.collector.paragraph(_text_content(element))
+            self.collector.end(tag)
+            # The subtree has been read; drop it to keep memory flat on big pages
+            if tag in ('p', 'img', 'title'):
+                element.clear(keep_tail=True)
+
+
+def _text_content(element) -> str:
+    """Text of an element and its children, leaving out scripts and styles."""
+    parts = [element.text or '']
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in _SKIP_TEXT:
+            parts.append(_text_content(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def available_backend() -> str:
+    return 'lxml' if etree is not None else 'html.parser'
+
+
+def extract_html(
+    chunks: Iterable[bytes],
+    encoding: Optional[str] = None,
+    max_bytes: int = EXTRACT_MAX_BYTES,
+    max_text_chars: int = EXTRACT_MAX_TEXT_CHARS,
+    backend: Optional[str] = None,
+) -> Dict:
+    """Extract title, paragraph text and images from a stream of HTML bytes.
+
+    Reading stops after max_bytes, or as soon as max_text_chars of text have
+    been collected. Uses lxml when it is installed and the standard library
+    parser otherwise. Without an encoding (no charset in the response), the
+    page's byte order mark or <meta charset> decides, and UTF-8 otherwise.
+    """
+    collector = _Collector(max_text_chars)
+    if (backend or available_backend()) == 'lxml':
+        parser = _LxmlParser(collector, encoding)
+    else:
+        parser = _StdlibParser(collector, encoding)
+
+    read = 0
+    for chunk in chunks:
+        if read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        parser.feed_bytes(chunk)
+        if read >= max_bytes or collector.done:
+            break
+
+    parser.finish()
+    return collector.result()
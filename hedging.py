@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterator, List, Optional
+from metrics import REGISTRY, span
+from ratelimit import keep_priority
+
+if TYPE_CHECKING:
+    from blog_generator import BlogGenerator
+
+# Provider asked first by ai_model='hedged'; 'auto' picks the one with the lower median latency
+HEDGE_PRIMARY = os.getenv("HEDGE_PRIMARY", "openai")
+# The hedge is sent once the primary is slower than this percentile of its recent first-token latencies
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+# Hedge delay used until a provider has HEDGE_MIN_SAMPLES latencies, and the bounds of the delay
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "5"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "30"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+# Recent latencies kept per provider
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    'blog_llm_first_token_seconds', 'Time from the start of a provider request to its first token', ('provider',))
+HEDGE_OUTCOMES = REGISTRY.counter(
+    'blog_hedge_requests_total', 'Hedged generations, by which provider answered and how', ('winner', 'outcome'))
+
+
+class LatencyTracker:
+    """Recent first-token latencies per provider, for percentile-based hedge delays."""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, provider: str, seconds: float):
+        FIRST_TOKEN_SECONDS.observe(seconds, provider=provider)
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider: str, percent: float) -> Optional[float]:
+        """The given percentile of a provider's recent latencies, or None with too few of them."""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait for the provider's first token before hedging."""
+        delay = self.percentile(provider, HEDGE_PERCENTILE)
+        if delay is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, delay))
+
+    def fastest(self, providers: List[str], default: str) -> str:
+        """The provider with the lowest median latency; default until every one has enough samples."""
+        medians = {provider: self.percentile(provider, 50) for provider in providers}
+        if any(median is None for median in medians.values()):
+            return default
+        return min(providers, key=lambda provider: medians[provider])
+
+
+class _Attempt:
+    """One provider's generation, streamed from a thread into the shared event queue."""
+
+    def __init__(self, generator: 'BlogGenerator', content: List[Dict], events: queue.Queue):
+        self.generator = generator
+        self.content = content
+        self.events = events
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=keep_priority(self._run), name=f"hedge-{generator.provider}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self):
+        stream = self.generator.stream_condensed(self.content)
+        try:
+            for text in stream:
+                if self.cancelled.is_set():
+                    return
+                self.events.put((self, 'token', text))
+            self.events.put((self, 'done', None))
+        except Exception as e:
+            self.events.put((self, 'error', e))
+        finally:
+            # Closing the stream closes the provider's response, so a cancelled call stops there
+            stream.close()
+
+
+class HedgedBlogGenerator:
+    """Generates with a primary provider and hedges with the others.
+
+    The sources are condensed (summarized when needed) once, for the
+    smallest prompt budget among the providers. The primary is asked first.
+    If it has not produced a first token after its hedge delay (a
+    percentile of its recent first-token latencies) or fails, the next
+    provider is asked too. The first to produce a token wins and the others
+    are cancelled. A failure after the first token is not retried, as part
+    of the post was already produced.
+
+    input_tokens and output_tokens under-count a hedged request: providers
+    report usage at the end of a stream, which a cancelled attempt never
+    reaches, so only the winner's usage is counted.
+    """
+    name = 'Hedged'
+
+    def __init__(self, generators: List['BlogGenerator'], tracker: Optional['LatencyTracker'] = None):
+        self.generators = generators
+        self.tracker = tracker or get_latency_tracker()
+        # The winner's, once known
+        self.provider = generators[0].provider
+        self.model = generators[0].model
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(generator.input_tokens for generator in self.generators)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(generator.output_tokens for generator in self.generators)
+
+    def generate(self, content: List[Dict]) -> str:
+        """Generate blog content."""
+        return ''.join(self.generate_stream(content))
+
+    def generate_stream(self, content: List[Dict]) -> Iterator[str]:
+        """Generate blog content, yielding text as it arrives from the winning provider."""
+        with span('generate'):
+            yield from self._race(self._condense(content))
+
+    def _condense(self, content: List[Dict]) -> List[Dict]:
+        """Condense the sources with the provider of the smallest prompt budget, falling back to the others."""
+        errors = []
+        for generator in sorted(self.generators, key=lambda generator: generator.packer.budget):
+            try:
+                return generator.condense(content)
+            except Exception as e:
+                errors.append(f"Failed to summarize sources with {generator.name}: {str(e)}")
+        raise Exception("Every provider failed: " + "; ".join(errors))
+
+    def _race(self, content: List[Dict]) -> Iterator[str]:
+        events: queue.Queue = queue.Queue()
+        waiting = list(self.generators)
+        attempts: List[_Attempt] = []
+        errors: List[str] = []
+
+        def launch():
+            attempt = _Attempt(waiting.pop(0), content, events)
+            attempts.append(attempt)
+            attempt.start()
+            return time.monotonic() + self.tracker.hedge_delay(attempt.generator.provider)
+
+        try:
+            hedge_at = launch()
+            winner, first = None, None
+            while winner is None:
+                timeout = max(0.0, hedge_at - time.monotonic()) if waiting else None
+                try:
+                    attempt, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = launch()
+                    continue
+                if kind == 'error':
+                    errors.append(str(value))
+                    if waiting:
+                        # Fall back right away rather than waiting out the hedge delay
+                        hedge_at = launch()
+                    elif len(errors) == len(attempts):
+                        raise Exception("Every provider failed: " + "; ".join(errors))
+                    continue
+                winner, first = attempt, value
+
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            self.provider = winner.generator.provider
+            self.model = winner.generator.model
+            if errors:
+                outcome = 'fallback'
+            elif len(attempts) == 1:
+                outcome = 'primary_only'
+            else:
+                outcome = 'primary_won' if winner is attempts[0] else 'hedge_won'
+            HEDGE_OUTCOMES.inc(winner=self.provider, outcome=outcome)
+
+            kind, value = ('token', first) if first is not None else ('done', None)
+            while kind == 'token':
+                yield value
+                attempt, kind, value = events.get()
+                # Whatever a cancelled attempt sent before it stopped is dropped
+                while attempt is not winner:
+                    attempt, kind, value = events.get()
+            if kind == 'error':
+                raise value
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+
+_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Return the process-wide latency tracker."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LatencyTracker()
+        return _tracker
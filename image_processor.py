@@ -1,45 +1,175 @@
-from typing import Dict, List
-from openai import OpenAI
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image
+import httpx
 from dotenv import load_dotenv
-import os                                                                                                                  
+from cache import ContentCache, get_cache, normalize_url
+from clients import get_clients
+from metrics import record_bytes, record_tokens, span
+from ratelimit import get_scheduler, keep_priority
+import base64
+import hashlib
+import os
 load_dotenv()
 
-class ImageProcessor:                                                                                                      
-    def __init__(self):                                                                                                    
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    def process_images(self, content: List[Dict]) -> List[Dict]:                                                           
-        """Process images and generate descriptive alt text."""                                                            
-        for item in content:                                                                                               
-            if 'images' in item:                                                                                           
-                for image in item['images']:                                                                               
-                    try:                                                                                                   
-                        # Generate alt text using OpenAI's vision model
-                        # print(image["url"], image["current_alt"])
-                        # alt_text = self._generate_alt_text(image['url'])                                                   
-                        # image['generated_alt'] = alt_text                 
-                        pass                                                 
-                    except Exception as e:                                                                                 
-                        print(f"Failed to generate alt text for image: {str(e)}")                                          
-                        image['generated_alt'] = image.get('current_alt', '')                                              
-                                                                                                                            
-        return content                                                                                                     
-                                                                                                                            
-    def _generate_alt_text(self, image_url: str) -> str:                                                                   
-        """Generate alt text for an image using OpenAI's vision model."""                                                  
-        try:                                                                                                               
-            response = self.client.chat.completions.create(                                                                       
-                model="gpt-4",                                                                              
-                messages=[                                                                                                 
-                    {                                                                                                      
-                        "role": "user",                                                                                    
-                        "content": [                                                                                       
-                            {"type": "text", "text": "Generate a concise, descriptive alt text for this image."},          
-                            {"type": "image_url", "image_url": image_url}                                                  
-                        ],                                                                                                 
-                    }                                                                                                      
-                ]                                                                                                          
-            )                                                                                                              
-            return response.choices[0].message.content                                                                     
-        except Exception as e:                                                                                             
-            raise Exception(f"Failed to generate alt text: {str(e)}")                                                      
\ No newline at end of file
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+ALT_TEXT_ENABLED = os.getenv("ALT_TEXT_ENABLED", "1") == "1"
+ALT_TEXT_MODEL = os.getenv("ALT_TEXT_MODEL", "gpt-4o-mini")
+ALT_TEXT_CONCURRENCY = int(os.getenv("ALT_TEXT_CONCURRENCY", "8"))
+# Existing alt text with at least this many words is kept as is
+ALT_TEXT_MIN_WORDS = int(os.getenv("ALT_TEXT_MIN_WORDS", "3"))
+# Images smaller than this in either dimension are icons or tracking pixels
+ALT_TEXT_MIN_SIZE = int(os.getenv("ALT_TEXT_MIN_SIZE", "48"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Prompt, low-detail image and completion tokens of one alt text call, for rate limiting
+ALT_TEXT_CALL_TOKENS = 200
+
+
+class ImageProcessor:
+    def __init__(self, cache: Optional[ContentCache] = None, client: Optional['OpenAI'] = None, http_client: Optional[httpx.Client] = None):
+        self._client = client
+        self.http_client = http_client or get_clients().http()
+        self.cache = cache or get_cache()
+
+    @property
+    def client(self) -> 'OpenAI':
+        # Only loads the OpenAI SDK once an image actually needs alt text
+        if self._client is None:
+            self._client = get_clients().openai()
+        return self._client
+
+    def process_images(self, content: List[Dict]) -> List[Dict]:
+        """Process images and generate descriptive alt text."""
+        with span('images'):
+            return self._process_images(content)
+
+    def _process_images(self, content: List[Dict]) -> List[Dict]:
+        # Group every image needing alt text by normalized URL, so each is handled once
+        by_url: Dict[str, List[Dict]] = {}
+        for item in content:
+            for image in item.get('images', []):
+                current_alt = image.get('current_alt') or ''
+                if not ALT_TEXT_ENABLED or len(current_alt.split()) >= ALT_TEXT_MIN_WORDS:
+                    image['generated_alt'] = current_alt
+                elif image.get('url', '').startswith(('http://', 'https://')):
+                    by_url.setdefault(normalize_url(image['url']), []).append(image)
+                else:
+                    image['generated_alt'] = current_alt
+
+        # The normalized URL is only a key; images are downloaded from the URL the page gave
+        alt_texts = self._alt_texts({key: images[0]['url'] for key, images in by_url.items()})
+
+        for url, images in by_url.items():
+            for image in images:
+                image['generated_alt'] = alt_texts.get(url) or image.get('current_alt', '')
+
+        return content
+
+    def _alt_texts(self, urls: Dict[str, str]) -> Dict[str, str]:
+        """Return alt text per normalized URL, from the cache or the vision model.
+
+        urls maps each normalized URL to a URL to download the image from.
+        """
+        alt_texts = {}
+        missing = []
+        for url in urls:
+            cached = self.cache.get('alt', url)
+            if cached is not None:
+                alt_texts[url] = cached['alt']
+            else:
+                missing.append(url)
+
+        if not missing:
+            return alt_texts
+
+        with ThreadPoolExecutor(max_workers=ALT_TEXT_CONCURRENCY) as pool:
+            # Download everything first; the same image is often served from several URLs
+            downloads = dict(zip(missing, pool.map(self._download, [urls[url] for url in missing])))
+
+            # One vision call per distinct image content
+            images: Dict[str, Tuple[str, bytes]] = {}
+            for download in downloads.values():
+                if download is not None and download[2] is not None:
+                    images.setdefault(download[0], (download[1], download[2]))
+
+            by_hash: Dict[str, str] = {}
+            pending = []
+            for digest in images:
+                cached = self.cache.get('alt_hash', digest)
+                if cached is not None:
+                    by_hash[digest] = cached['alt']
+                else:
+                    pending.append(digest)
+
+            generated = pool.map(keep_priority(lambda digest: self._generate_alt_text(*images[digest])), pending)
+            for digest, alt_text in zip(pending, generated):
+                if alt_text:
+                    by_hash[digest] = alt_text
+                    self.cache.set('alt_hash', digest, {'alt': alt_text})
+
+        for url, download in downloads.items():
+            if download is None:
+                continue
+            if download[2] is None:
+                # Icons and tracking pixels get no alt text; remember that too
+                alt_texts[url] = ''
+            elif download[0] in by_hash:
+                alt_texts[url] = by_hash[download[0]]
+            else:
+                continue
+            self.cache.set('alt', url, {'alt': alt_texts[url]})
+
+        return alt_texts
+
+    def _download(self, url: str) -> Optional[Tuple[str, str, Optional[bytes]]]:
+        """Download an image and return its content hash, MIME type and bytes.
+
+        The bytes are None for images too small to need alt text.
+        """
+        try:
+            with self.http_client.stream("GET", url) as response:
+                response.raise_for_status()
+                data = bytearray()
+                for chunk in response.iter_bytes():
+                    data.extend(chunk)
+                    if len(data) > IMAGE_MAX_BYTES:
+                        return None
+                record_bytes('images', response.num_bytes_downloaded)
+
+            digest = hashlib.sha256(data).hexdigest()
+            with Image.open(BytesIO(data)) as image:
+                mime_type = Image.MIME.get(image.format, 'image/png')
+                if min(image.size) < ALT_TEXT_MIN_SIZE:
+                    return digest, mime_type, None
+            return digest, mime_type, bytes(data)
+        except Exception as e:
+            print(f"Failed to download image {url}: {str(e)}")
+            return None
+
+    def _generate_alt_text(self, mime_type: str, data: bytes) -> Optional[str]:
+        """Generate alt text for an image using OpenAI's vision model."""
+        try:
+            # Send the bytes we already have instead of making OpenAI fetch the URL again
+            image_url = f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
+            response = get_scheduler().call('openai', lambda: self.client.chat.completions.create(
+                model=ALT_TEXT_MODEL,
+                max_tokens=100,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": "Generate a concise, descriptive alt text for this image."},
+                            {"type": "image_url", "image_url": {"url": image_url, "detail": "low"}}
+                        ],
+                    }
+                ]
+            ), tokens=ALT_TEXT_CALL_TOKENS)
+            if response.usage:
+                record_tokens('openai', response.usage.prompt_tokens, response.usage.completion_tokens)
+            return response.choices[0].message.content
+        except Exception as e:
+            print(f"Failed to generate alt text for image: {str(e)}")
+            return None
@@ -0,0 +1,127 @@
+import asyncio
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from cache import ContentCache, get_cache, normalize_source
+from ratelimit import keep_priority
+from singleflight import SingleFlight
+from summary_index import content_hash
+
+if TYPE_CHECKING:
+    from scraper import WebScraper
+    from reddit_parser import RedditParser
+
+# Limits can be tuned per deployment through the environment
+MAX_CONCURRENCY_PER_REQUEST = int(os.getenv("INGEST_MAX_CONCURRENCY", "8"))
+MAX_CONCURRENCY_PER_PROCESS = int(os.getenv("INGEST_PROCESS_CONCURRENCY", "32"))
+SOURCE_TIMEOUT = float(os.getenv("INGEST_SOURCE_TIMEOUT", "30"))
+
+# The scrapers are blocking, so they run on a shared thread pool. Its size is
+# the per-process limit on sources being fetched at the same time.
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY_PER_PROCESS, thread_name_prefix="ingest")
+
+# Requests fetching the same source at the same time share a single fetch
+_flights = {'url': SingleFlight('url'), 'reddit': SingleFlight('reddit')}
+
+
+async def ingest_sources(
+    urls: List[str],
+    subreddits: List[str],
+    web_scraper: Optional['WebScraper'] = None,
+    reddit_parser: Optional['RedditParser'] = None,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    on_source: Optional[Callable[[str, str, Optional[Dict]], None]] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Fetch all URLs and subreddits concurrently.
+
+    Returns the sources that were ingested successfully, in request order
+    and tagged with their 'source', 'type' and the 'content_hash' of their
+    extracted content (taken before deduplication changes it), and one
+    error entry per source that failed or missed its deadline.
+    With use_cache=False cached entries are ignored but still refreshed.
+    on_source is called with the type, the source and its error entry (None
+    on success) as each source finishes; an exception it raises stops the
+    ingestion and is raised here.
+    """
+    # Imported here so praw is only loaded when there are subreddits to parse
+    if urls and web_scraper is None:
+        from scraper import WebScraper
+        web_scraper = WebScraper()
+    if subreddits and reddit_parser is None:
+        from reddit_parser import RedditParser
+        reddit_parser = RedditParser()
+
+    semaphore = asyncio.Semaphore(max_concurrency or MAX_CONCURRENCY_PER_REQUEST)
+    deadline = timeout or SOURCE_TIMEOUT
+    cache = get_cache()
+
+    jobs = [('url', url, web_scraper.scrape) for url in urls or []]
+    jobs += [('reddit', subreddit, reddit_parser.parse) for subreddit in subreddits or []]
+
+    async def fetch_one(source_type: str, source: str, fetch: Callable[[str], Dict]):
+        result = await _fetch(source_type, source, _cached(cache, source_type, fetch, use_cache), semaphore, deadline)
+        if result[0] is not None:
+            result[0].update(source=source, type=source_type, content_hash=content_hash(result[0]))
+        if on_source:
+            on_source(source_type, source, result[1])
+        return result
+
+    results = await asyncio.gather(*[fetch_one(source_type, source, fetch) for source_type, source, fetch in jobs])
+
+    content = [result for result, error in results if error is None]
+    errors = [error for result, error in results if error is not None]
+    return content, errors
+
+
+def _cached(cache: ContentCache, source_type: str, fetch: Callable[[str], Dict], read: bool) -> Callable[[str], Dict]:
+    """Wrap a fetch function with the persistent content cache.
+
+    On a miss, concurrent fetches of the same normalized source are
+    coalesced, so only one of them reaches the site or Reddit.
+    """
+    def fetch_and_store(source: str) -> Dict:
+        result = fetch(source)
+        cache.set(source_type, source, result)
+        return result
+
+    def fetch_cached(source: str) -> Dict:
+        if read:
+            cached = cache.get(source_type, source)
+            if cached is not None:
+                return cached
+        key = normalize_source(source_type, source)
+        result = _flights[source_type].do(key, lambda: fetch_and_store(source))
+        # Callers of a shared fetch get the same object; later stages edit it in place
+        return copy.deepcopy(result)
+    return fetch_cached
+
+
+async def _fetch(
+    source_type: str,
+    source: str,
+    fetch: Callable[[str], Dict],
+    semaphore: asyncio.Semaphore,
+    timeout: float,
+) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Fetch a single source, turning failures into an error entry."""
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        try:
+            # A timed out fetch keeps its worker thread until the blocking call
+            # returns, but the request no longer waits for it.
+            result = await asyncio.wait_for(loop.run_in_executor(_executor, keep_priority(fetch), source), timeout)
+            return result, None
+        except asyncio.TimeoutError:
+            message = f"Timed out after {timeout:g}s"
+        except Exception as e:
+            message = str(e)
+
+    action = "scraping" if source_type == 'url' else "parsing Reddit content"
+    return None, {
+        'source': source,
+        'type': source_type,
+        'error': f"Error {action} {source}: {message}",
+    }
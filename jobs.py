@@ -0,0 +1,312 @@
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from cache import sqlite_connection
+from pipeline import run_pipeline
+from ratelimit import BATCH, priority
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", str(Path(os.getenv("CACHE_DIR", ".cache")) / "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Running jobs whose lease was not renewed for this long are assumed lost with their worker and handed out again
+JOB_LEASE_TIMEOUT = float(os.getenv("JOB_LEASE_TIMEOUT", "1800"))
+# How often a worker renews the lease of the jobs it is running
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "60"))
+
+
+class LeaseLost(Exception):
+    """The job was handed to another worker while this one was running it."""
+
+
+class JobQueue:
+    """Interface every job queue backend implements.
+
+    A job is a dict with id, status ('queued', 'running', 'completed' or
+    'failed'), stage, payload, result, error and timestamps.
+    """
+
+    def submit(self, payload: Dict) -> str:
+        raise NotImplementedError
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Take the oldest queued job and mark it running, or return None."""
+        raise NotImplementedError
+
+    def update(self, job_id: str, worker_id: Optional[str] = None, **fields) -> bool:
+        """Set fields of a job.
+
+        With worker_id the job is only updated while that worker holds it;
+        returns whether it was updated.
+        """
+        raise NotImplementedError
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        """Extend the lease of a running job; False once another worker holds it."""
+        return self.update(job_id, worker_id, leased_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+
+class MemoryJobQueue(JobQueue):
+    """In-process queue; jobs are lost when the process exits."""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, payload: Dict) -> str:
+        job = _new_job(payload)
+        with self._lock:
+            self._jobs[job['id']] = job
+        return job['id']
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job['status'] == 'queued':
+                    job.update(status='running', worker=worker_id, started_at=now, leased_at=now)
+                    return dict(job)
+        return None
+
+    def update(self, job_id: str, worker_id: Optional[str] = None, **fields) -> bool:
+        with self._lock:
+            job = self._jobs[job_id]
+            if worker_id is not None and (job['worker'] != worker_id or job['status'] != 'running'):
+                return False
+            job.update(fields)
+            return True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SQLiteJobQueue(JobQueue):
+    """Queue stored in a SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, lease_timeout: float = JOB_LEASE_TIMEOUT):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_timeout = lease_timeout
+        self._local = threading.local()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                leased_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at);
+        """)
+        columns = [row['name'] for row in self._connection().execute("PRAGMA table_info(jobs)")]
+        if 'leased_at' not in columns:
+            # Queues created before leases were renewed
+            self._connection().execute("ALTER TABLE jobs ADD COLUMN leased_at REAL")
+
+    def _connection(self) -> sqlite3.Connection:
+        # A job must survive a power loss once submit() returns
+        return sqlite_connection(self._local, self.path, row_factory=sqlite3.Row, synchronous="FULL")
+
+    def submit(self, payload: Dict) -> str:
+        job = _new_job(payload)
+        self._connection().execute(
+            "INSERT INTO jobs (id, status, stage, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job['id'], job['status'], job['stage'], json.dumps(payload), job['created_at'])
+        )
+        return job['id']
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same job
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND COALESCE(leased_at, started_at) < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - self.lease_timeout,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, leased_at = ? WHERE id = ?",
+                    (worker_id, now, now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row['id']) if row is not None else None
+
+    def update(self, job_id: str, worker_id: Optional[str] = None, **fields) -> bool:
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        if worker_id is None:
+            cursor = self._connection().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        else:
+            cursor = self._connection().execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND worker = ? AND status = 'running'",
+                (*fields.values(), job_id, worker_id)
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+def _new_job(payload: Dict) -> Dict:
+    return {
+        'id': uuid.uuid4().hex,
+        'status': 'queued',
+        'stage': None,
+        'payload': payload,
+        'result': None,
+        'error': None,
+        'worker': None,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'leased_at': None,
+    }
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    """Create a job queue from a backend name or a 'module:ClassName' path."""
+    if backend == 'sqlite':
+        return SQLiteJobQueue()
+    if backend == 'memory':
+        return MemoryJobQueue()
+
+    # Custom backends (e.g. one backed by a network service so workers can run
+    # on other hosts) are loaded by import path
+    module_name, _, class_name = backend.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class WorkerPool:
+    """Bounded pool of background threads running queued blog jobs."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        size: int = JOB_WORKERS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+    ):
+        self.queue = queue
+        self.size = size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        # Jobs being run, with the worker running each and whether its lease was lost
+        self._running: Dict[str, Tuple[str, threading.Event]] = {}
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, args=(f"{self._worker_prefix}:{i}",), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def notify(self):
+        """Wake idle workers after a job was submitted from this process."""
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id)
+            except Exception as e:
+                print(f"Failed to claim job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._process(job, worker_id)
+
+    def _heartbeat(self):
+        """Renew the leases of the running jobs, so they are not handed to another worker."""
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._running_lock:
+                running = list(self._running.items())
+            for job_id, (worker_id, lost) in running:
+                try:
+                    if not self.queue.renew(job_id, worker_id):
+                        lost.set()
+                except Exception as e:
+                    print(f"Failed to renew job {job_id}: {str(e)}")
+
+    def _process(self, job: Dict, worker_id: str):
+        job_id = job['id']
+        payload = job['payload']
+        lost = threading.Event()
+        with self._running_lock:
+            self._running[job_id] = (worker_id, lost)
+
+        def on_stage(stage: str):
+            # Stop at the next stage once another worker has taken the job over
+            if lost.is_set() or not self.queue.update(job_id, worker_id, stage=stage):
+                raise LeaseLost(f"Job {job_id} was handed to another worker")
+
+        try:
+            # Queued jobs give way to interactive requests at the providers
+            with priority(BATCH):
+                result = run_pipeline(
+                    urls=payload.get('urls', []),
+                    subreddits=payload.get('subreddits', []),
+                    ai_model=payload.get('ai_model', 'openai'),
+                    use_cache=payload.get('use_cache', True),
+                    fresh=payload.get('fresh', False),
+                    update=payload.get('update'),
+                    title=payload.get('title'),
+                    on_stage=on_stage,
+                )
+            finished = self.queue.update(job_id, worker_id, status='completed', result=result, finished_at=time.time())
+        except Exception as e:
+            finished = self.queue.update(job_id, worker_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            with self._running_lock:
+                del self._running[job_id]
+        if not finished:
+            print(f"Dropped the outcome of job {job_id}: it was handed to another worker")
@@ -0,0 +1,171 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# Seconds; covers everything from a cached lookup to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Histogram with cumulative buckets, as Prometheus expects."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts, sum, count
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def summary(self) -> Dict[Tuple[str, ...], Tuple[float, int]]:
+        """Return (sum, count) per label set."""
+        with self._lock:
+            return {key: (entry[1], entry[2]) for key, entry in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = _format_labels(self.labels, key)
+            bounds = ['%g' % bound for bound in self.buckets] + ['+Inf']
+            for bound, bucket_count in zip(bounds, counts + [count]):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {bucket_count}")
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Holds every metric of the process and renders them for /metrics."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'blog_stage_duration_seconds', 'Time spent in each pipeline stage', ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'blog_stage_errors_total', 'Calls of each pipeline stage that raised', ('stage',))
+STAGE_BYTES = REGISTRY.counter(
+    'blog_stage_bytes_total', 'Bytes downloaded or written by each pipeline stage', ('stage',))
+LLM_TOKENS = REGISTRY.counter(
+    'blog_llm_tokens_total', 'LLM tokens used, by provider and direction', ('provider', 'direction'))
+CACHE_REQUESTS = REGISTRY.counter(
+    'blog_cache_requests_total', 'Content cache lookups, by kind and result', ('kind', 'result'))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block of work as one call of a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_bytes(stage: str, amount: int):
+    STAGE_BYTES.inc(amount, stage=stage)
+
+
+def record_tokens(provider: str, input_tokens: int = 0, output_tokens: int = 0):
+    if input_tokens:
+        LLM_TOKENS.inc(input_tokens, provider=provider, direction='input')
+    if output_tokens:
+        LLM_TOKENS.inc(output_tokens, provider=provider, direction='output')
+
+
+def stage_breakdown() -> List[Dict]:
+    """Per-stage totals collected so far in this process, slowest first."""
+    seconds = STAGE_SECONDS.summary()
+    errors = STAGE_ERRORS.values()
+    stage_bytes = STAGE_BYTES.values()
+    stages = set(seconds) | set(stage_bytes)
+    rows = []
+    for key in stages:
+        total, count = seconds.get(key, (0.0, 0))
+        rows.append({
+            'stage': key[0],
+            'calls': count,
+            'errors': int(errors.get(key, 0)),
+            'seconds': total,
+            'bytes': int(stage_bytes.get(key, 0)),
+        })
+    return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+
+def token_totals() -> Dict[Tuple[str, str], int]:
+    return {key: int(value) for key, value in LLM_TOKENS.values().items()}
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from ingestion import ingest_sources
+from blog_generator import BlogGenerator, OpenAIBlogGenerator, ClaudeBlogGenerator
+from hedging import HEDGE_PRIMARY, HedgedBlogGenerator, get_latency_tracker
+from blog_store import BlogDraft, get_store
+from dedup import deduplicate
+from image_processor import ImageProcessor
+from summary_index import get_summary_index
+
+
+def get_generator(ai_model: str, use_cache: bool = True, incremental: bool = False):
+    """Return the blog generator for the selected AI model.
+
+    'hedged' asks HEDGE_PRIMARY first and the other provider when it is slow
+    or fails; 'auto' does the same with the provider that has recently been
+    fastest as the primary. A provider whose client cannot be created is
+    left out, and with only one left its own generator is returned. An
+    incremental generator writes from per-source summaries kept in the
+    summary index, so an update only summarizes the sources that changed.
+    """
+    summaries = get_summary_index() if incremental else None
+    if ai_model in ('hedged', 'auto'):
+        # A provider whose client cannot be created (no API key) is left out
+        generators, errors = {}, []
+        for provider, generator_class in (('openai', OpenAIBlogGenerator), ('claude', ClaudeBlogGenerator)):
+            try:
+                generators[provider] = generator_class(use_cache=use_cache, summaries=summaries)
+            except Exception as e:
+                errors.append(f"{generator_class.name}: {str(e)}")
+        if not generators:
+            raise Exception("No AI provider is available: " + "; ".join(errors))
+        if len(generators) == 1:
+            return next(iter(generators.values()))
+
+        primary = HEDGE_PRIMARY if HEDGE_PRIMARY in generators else 'openai'
+        if ai_model == 'auto':
+            primary = get_latency_tracker().fastest(list(generators), primary)
+        order = [primary] + [provider for provider in generators if provider != primary]
+        return HedgedBlogGenerator([generators[provider] for provider in order])
+    if ai_model == 'openai':
+        return OpenAIBlogGenerator(use_cache=use_cache, summaries=summaries)
+    return ClaudeBlogGenerator(use_cache=use_cache, summaries=summaries)
+
+
+def update_sources(blog_id: str, urls: List[str], subreddits: List[str]) -> Tuple[List[str], List[str]]:
+    """Return the sources of a previous blog plus the given ones, to update that blog."""
+    previous = get_store().get(blog_id)
+    if previous is None:
+        raise LookupError(f"Blog {blog_id} not found")
+    return (
+        list(dict.fromkeys([*previous['urls'], *urls])),
+        list(dict.fromkeys([*previous['subreddits'], *subreddits])),
+    )
+
+
+def save_blog(
+    blog_content: str,
+    generator: Optional[Union[BlogGenerator, HedgedBlogGenerator]] = None,
+    ai_model: Optional[str] = None,
+    urls: Optional[List[str]] = None,
+    subreddits: Optional[List[str]] = None,
+    errors: Optional[List[Dict]] = None,
+    title: Optional[str] = None,
+    update_of: Optional[str] = None,
+    timings: Optional[Dict[str, float]] = None,
+    draft: Optional[BlogDraft] = None,
+) -> Dict:
+    """Add a blog to the blog store with its metadata and return its record.
+
+    The write itself happens in the background; the record's id can be used
+    right away. The draft the blog was streamed to is removed once written.
+    """
+    return get_store().save(
+        blog_content,
+        title=title,
+        ai_model=ai_model,
+        model=generator.model if generator else None,
+        urls=urls,
+        subreddits=subreddits,
+        errors=errors,
+        update_of=update_of,
+        timings=timings,
+        input_tokens=generator.input_tokens if generator else 0,
+        output_tokens=generator.output_tokens if generator else 0,
+        draft=draft,
+    )
+
+
+def stream_blog(generator, content: List[Dict], draft: BlogDraft) -> Iterator[str]:
+    """Stream a blog from the generator, writing each piece of text to the draft as it arrives."""
+    try:
+        for text in generator.generate_stream(content):
+            draft.write(text)
+            yield text
+    finally:
+        # Whatever was generated stays in the draft if the stream stops early
+        draft.close()
+
+
+def run_pipeline(
+    urls: List[str],
+    subreddits: List[str],
+    ai_model: str = 'openai',
+    use_cache: bool = True,
+    fresh: bool = False,
+    on_stage: Optional[Callable[[str], None]] = None,
+    on_source: Optional[Callable[[str, str, Optional[Dict]], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    update: Optional[str] = None,
+    title: Optional[str] = None,
+) -> Dict:
+    """Run ingestion, deduplication, image processing and generation, then save the blog.
+
+    use_cache=False fetches every source again; fresh=True asks the AI model
+    for a new post even if the same prompt was answered before. on_stage is
+    called with the name of each stage as it starts, on_source as each
+    source is ingested (see ingest_sources). With on_token the post is
+    streamed and on_token gets each piece of text. update is the id of a
+    previous blog to regenerate from its sources (plus any given), reusing
+    the summaries of sources that did not change. The blog is added to the
+    blog store with its sources, model, stage timings and token counts, and
+    the title (from its first heading when not given). Returns the blog
+    content, its id, the content file and the per-source errors.
+    """
+    # When each stage started, for the blog's timings
+    marks = []
+
+    def stage(name: str):
+        marks.append((name, time.perf_counter()))
+        if on_stage:
+            on_stage(name)
+
+    if update:
+        urls, subreddits = update_sources(update, urls, subreddits)
+
+    stage('ingesting')
+    content, errors = asyncio.run(ingest_sources(urls, subreddits, use_cache=use_cache, on_source=on_source))
+    if not content:
+        raise Exception("No content was successfully scraped or parsed: " + "; ".join(e['error'] for e in errors))
+
+    stage('deduplicating')
+    content = deduplicate(content)
+
+    stage('processing_images')
+    processed_content = ImageProcessor().process_images(content)
+
+    stage('generating')
+    generator = get_generator(ai_model, use_cache=not fresh, incremental=bool(update))
+    draft = None
+    if on_token:
+        draft = get_store().draft()
+        parts = []
+        for text in stream_blog(generator, processed_content, draft):
+            parts.append(text)
+            on_token(text)
+        blog_content = ''.join(parts)
+    else:
+        blog_content = generator.generate(processed_content)
+
+    stage('saving')
+    timings = {name: end - start for (name, start), (_, end) in zip(marks, marks[1:])}
+    record = save_blog(
+        blog_content, generator, ai_model, urls, subreddits, errors,
+        title=title, update_of=update, timings=timings, draft=draft
+    )
+
+    return {
+        'content': blog_content,
+        'blog_id': record['id'],
+        'filename': str(get_store().file_path(record)),
+        'errors': errors,
+    }
@@ -0,0 +1,138 @@
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Tokens of source content each provider's prompt may hold
+PROMPT_TOKEN_BUDGETS = {
+    'openai': int(os.getenv("PROMPT_TOKEN_BUDGET_OPENAI", "5000")),
+    'claude': int(os.getenv("PROMPT_TOKEN_BUDGET_CLAUDE", "20000")),
+}
+# Inputs up to this multiple of the budget are trimmed; larger ones are map-reduced
+PROMPT_MAP_REDUCE_RATIO = float(os.getenv("PROMPT_MAP_REDUCE_RATIO", "1.5"))
+
+# Rough characters per token when no tokenizer is available for a provider
+_CHARS_PER_TOKEN = {
+    'openai': 4.0,
+    'claude': 3.5,
+}
+
+
+@lru_cache(maxsize=None)
+def _openai_encoding(model: str):
+    """Return the tiktoken encoding of an OpenAI model, or None without tiktoken."""
+    # Imported on first use, so Claude-only runs never load it
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+class TokenCounter:
+    """Counts and truncates text in a provider's tokens."""
+
+    def __init__(self, provider: str, model: Optional[str] = None):
+        self.chars_per_token = _CHARS_PER_TOKEN.get(provider, 4.0)
+        self.encoding = _openai_encoding(model or "gpt-4") if provider == 'openai' else None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ''
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text[:int(max_tokens * self.chars_per_token)]
+
+
+class ContentPacker:
+    """Packs scraped sources into a prompt that fits a token budget.
+
+    Titles are kept first, then page/post text, then comments. Within each
+    tier the budget is shared fairly: short sections are kept whole and the
+    longest ones are trimmed.
+    """
+
+    def __init__(self, provider: str, budget: Optional[int] = None, model: Optional[str] = None):
+        self.budget = budget or PROMPT_TOKEN_BUDGETS.get(provider, 5000)
+        self.counter = TokenCounter(provider, model)
+
+    def count(self, content: List[Dict]) -> int:
+        """Count the tokens of the unpacked content."""
+        return sum(self.counter.count(section) for item in content for section in _sections(item))
+
+    def needs_map_reduce(self, content: List[Dict]) -> bool:
+        return self.count(content) > self.budget * PROMPT_MAP_REDUCE_RATIO
+
+    def pack(self, content: List[Dict], budget: Optional[int] = None) -> str:
+        """Build the prompt text for the content in a single pass."""
+        budget = budget or self.budget
+        sections = [_sections(item) for item in content]
+        needs = [[self.counter.count(section) for section in item] for item in sections]
+
+        # Allocate the budget tier by tier: titles, then text, then comments
+        allocations = [[0, 0, 0] for _ in sections]
+        remaining = budget
+        for tier in range(3):
+            shares = _fair_share([need[tier] for need in needs], remaining)
+            for allocation, share in zip(allocations, shares):
+                allocation[tier] = share
+            remaining -= sum(shares)
+
+        parts = []
+        for item, (title, text, comments), allocation in zip(content, sections, allocations):
+            parts.append(f"Title: {self.counter.truncate(title, allocation[0])}\n")
+            parts.append(f"Content: {self.counter.truncate(text, allocation[1])}\n")
+            if 'comments' in item:
+                parts.append(f"Comments: {self.counter.truncate(comments, allocation[2])}\n")
+        return ''.join(parts)
+
+    def chunk(self, content: List[Dict], budget: Optional[int] = None) -> List[List[Dict]]:
+        """Split content into groups that each fit the budget on their own."""
+        budget = budget or self.budget
+        chunks: List[List[Dict]] = []
+        current: List[Dict] = []
+        used = 0
+        for item in content:
+            size = sum(self.counter.count(section) for section in _sections(item))
+            if current and used + size > budget:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(item)
+            used += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+
+def _sections(item: Dict) -> List[str]:
+    return [
+        item.get('title') or '',
+        item.get('text') or '',
+        ' '.join(item.get('comments', [])),
+    ]
+
+
+def _fair_share(needs: List[int], available: int) -> List[int]:
+    """Split available tokens so small needs are met in full and large ones share the rest."""
+    shares = [0] * len(needs)
+    pending = sorted(range(len(needs)), key=lambda i: needs[i])
+    while pending and available > 0:
+        share = available // len(pending)
+        smallest = pending[0]
+        if needs[smallest] <= share:
+            shares[smallest] = needs[smallest]
+            available -= needs[smallest]
+            pending.pop(0)
+        else:
+            for i in pending:
+                shares[i] = share
+            break
+    return shares
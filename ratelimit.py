@@ -0,0 +1,299 @@
+import contextvars
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+from metrics import REGISTRY
+
+T = TypeVar('T')
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+
+def _limits(provider: str, rpm: str, tpm: str, concurrency: str) -> Dict[str, float]:
+    prefix = f"RATE_LIMIT_{provider.upper()}_"
+    return {
+        'rpm': float(os.getenv(prefix + "RPM", rpm)),
+        'tpm': float(os.getenv(prefix + "TPM", tpm)),
+        'concurrency': int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+    }
+
+
+# Requests and tokens per minute, and the most calls in flight, per provider. 0 means no limit.
+RATE_LIMITS = {
+    'openai': _limits('openai', "500", "300000", "16"),
+    'claude': _limits('claude', "50", "40000", "8"),
+    'reddit': _limits('reddit', "100", "0", "8"),
+}
+# A provider's buckets hold this many seconds of its budget, the largest burst allowed
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+# Batch calls may only use this share of a provider's concurrency, the rest is kept for interactive calls
+RATE_LIMIT_BATCH_SHARE = float(os.getenv("RATE_LIMIT_BATCH_SHARE", "0.75"))
+RETRY_MAX_ATTEMPTS = max(1, int(os.getenv("RETRY_MAX_ATTEMPTS", "5")))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))
+
+WAIT_SECONDS = REGISTRY.histogram(
+    'blog_rate_limit_wait_seconds', 'Time calls waited for their provider budget', ('provider',))
+RETRIES = REGISTRY.counter(
+    'blog_rate_limit_retries_total', 'Provider calls retried, by reason', ('provider', 'reason'))
+
+_priority = contextvars.ContextVar('priority', default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Run the calls made inside the block at a priority (INTERACTIVE or BATCH)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def keep_priority(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap fn so it runs at the caller's priority when handed to a thread pool."""
+    level = _priority.get()
+
+    def run(*args, **kwargs):
+        with priority(level):
+            return fn(*args, **kwargs)
+    return run
+
+
+class TokenBucket:
+    """Refills at a per-minute rate, holding up to RATE_LIMIT_BURST_SECONDS of it.
+
+    A call larger than the bucket is admitted once the bucket is full and
+    leaves it in debt; later calls wait until the debt is paid back, so
+    the per-minute rate holds however large single calls are.
+    """
+
+    def __init__(self, per_minute: float, now: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * RATE_LIMIT_BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken; 0 when it can be taken now."""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A call larger than the bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        if self.rate > 0:
+            self.tokens -= amount
+
+
+class ProviderLimiter:
+    """Admission control for one provider.
+
+    A call is admitted once the request and token buckets allow it and
+    fewer calls than the concurrency limit are in flight. The limit grows
+    by one per limit's worth of successful calls and halves when the
+    provider throttles us (AIMD), and a Retry-After pauses the provider.
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, concurrency: int = 8):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting: Counter = Counter()
+        self.blocked_until = 0.0
+        self._last_backoff = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens: float = 0, level: str = INTERACTIVE):
+        start = time.monotonic()
+        with self._cond:
+            self.waiting[level] += 1
+            try:
+                while True:
+                    delay = self._admission_delay(tokens, level, time.monotonic())
+                    if delay == 0:
+                        break
+                    # Woken early when a call finishes or another caller is admitted
+                    self._cond.wait(timeout=min(delay, 1.0))
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self.in_flight += 1
+            finally:
+                self.waiting[level] -= 1
+                self._cond.notify_all()
+        WAIT_SECONDS.observe(time.monotonic() - start, provider=self.name)
+
+    def release(self, outcome: str = 'ok', retry_after: Optional[float] = None):
+        """Finish a call: 'ok', 'throttled' (429 and the like) or 'error'."""
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == 'throttled':
+                # Calls throttled in the same burst only halve the limit once
+                if now - self._last_backoff > 1.0:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_backoff = now
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+            elif outcome == 'ok':
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _admission_delay(self, tokens: float, level: str, now: float) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        slots = max(1, int(self.limit))
+        if level == BATCH:
+            if self.waiting[INTERACTIVE]:
+                return math.inf
+            slots = max(1, int(self.limit * RATE_LIMIT_BATCH_SHARE))
+        if self.in_flight >= slots:
+            return math.inf
+        return max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+
+class Scheduler:
+    """Every outbound provider call goes through here: rate limits, concurrency and retries."""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = limits if limits is not None else RATE_LIMITS
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider: str) -> ProviderLimiter:
+        with self._lock:
+            if provider not in self._limiters:
+                self._limiters[provider] = ProviderLimiter(provider, **self.limits.get(provider, {}))
+            return self._limiters[provider]
+
+    def call(self, provider: str, fn: Callable[[], T], tokens: float = 0) -> T:
+        """Call fn once the provider's budget allows, retrying throttled and transient failures."""
+        limiter = self.limiter(provider)
+        level = _priority.get()
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            limiter.acquire(tokens, level)
+            try:
+                result = fn()
+            except Exception as e:
+                self._failed(limiter, e, attempt)
+                continue
+            limiter.release('ok')
+            return result
+
+    def stream(
+        self,
+        provider: str,
+        fn: Callable[[], Iterator[T]],
+        tokens: float = 0,
+        on_first: Optional[Callable[[float], None]] = None,
+    ) -> Iterator[T]:
+        """Like call, for a streamed response; it is only retried until the first item arrives.
+
+        on_first gets the seconds from the start of the successful attempt
+        to its first item, which leaves out queueing, failed attempts and
+        backoff.
+        """
+        limiter = self.limiter(provider)
+        level = _priority.get()
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            limiter.acquire(tokens, level)
+            started = time.monotonic()
+            try:
+                iterator = iter(fn())
+                first = next(iterator)
+            except StopIteration:
+                limiter.release('ok')
+                return
+            except Exception as e:
+                self._failed(limiter, e, attempt)
+                continue
+            if on_first:
+                on_first(time.monotonic() - started)
+            break
+
+        outcome = 'error'
+        try:
+            yield first
+            yield from iterator
+            outcome = 'ok'
+        finally:
+            limiter.release(outcome)
+
+    def _failed(self, limiter: ProviderLimiter, error: Exception, attempt: int):
+        """Release a failed call; raise unless it should be retried, otherwise wait before the retry."""
+        kind, retry_after = classify_error(error)
+        limiter.release(kind, retry_after)
+        if kind == 'fatal' or attempt >= RETRY_MAX_ATTEMPTS:
+            raise error
+        RETRIES.inc(provider=limiter.name, reason=kind)
+        if kind == 'throttled' and retry_after:
+            # The limiter holds every call to this provider until then
+            return
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        time.sleep(retry_after or random.uniform(delay / 2, delay))
+
+
+def classify_error(error: Exception) -> Tuple[str, Optional[float]]:
+    """Classify a provider error as 'throttled', 'error' (transient) or 'fatal', with its Retry-After.
+
+    Works from the status code and headers the OpenAI, Anthropic, httpx and
+    prawcore exceptions carry, so none of those packages is imported here.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+    if status in (429, 529):
+        # Out of credit is not something waiting fixes
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            return 'fatal', None
+        return 'throttled', _retry_after(headers)
+    if status in (408, 409, 500, 502, 503, 504):
+        return 'error', _retry_after(headers)
+    if status is None:
+        names = [cls.__name__ for cls in type(error).__mro__]
+        # Timeouts and dropped connections, e.g. APITimeoutError, ConnectError, prawcore's RequestException
+        if any('Timeout' in name or 'Connect' in name for name in names) or 'RequestException' in names:
+            return 'error', None
+    return 'fatal', None
+
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        if headers.get('retry-after-ms'):
+            return min(RETRY_MAX_DELAY, float(headers['retry-after-ms']) / 1000)
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        return min(RETRY_MAX_DELAY, max(0.0, seconds))
+    except Exception:
+        return None
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Return the process-wide scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
@@ -1,59 +1,133 @@
-import praw                                                                                                                
-from typing import Dict                                                                                                    
-import sys
+import praw
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-load_dotenv()                                                                                                                  
-
-class RedditParser:                                                                                                        
-    def __init__(self):                                                                                                    
-        # Initialize Reddit API client (you'll need to set up your Reddit API credentials)                                 
-        self.reddit = praw.Reddit(                                                                                         
-            client_id="YOUR_CLIENT_ID",                                                                                    
-            client_secret="YOUR_CLIENT_SECRET",                                                                            
-            user_agent="your_user_agent"                                                                                   
-        )                                                                                                                  
-                                                                                                                            
-    def parse(self, subreddit_or_url: str) -> Dict:                                                                        
-        """Parse content from a subreddit or Reddit post URL."""                                                           
-        try:                                                                                                               
-            content = {                                                                                                    
-                'title': '',                                                                                               
-                'text': '',                                                                                                
-                'comments': [],                                                                                            
-                'images': []                                                                                               
-            }                                                                                                              
-                                                                                                                            
-            # Check if it's a full post URL or just a subreddit name                                                       
-            if 'reddit.com/r/' in subreddit_or_url and '/comments/' in subreddit_or_url:                                   
-                # It's a specific post                                                                                     
-                submission = self.reddit.submission(url=subreddit_or_url)                                                  
-                self._process_submission(submission, content)                                                              
-            else:                                                                                                          
-                # It's a subreddit                                                                                         
-                subreddit = self.reddit.subreddit(subreddit_or_url)                                                        
-                for submission in subreddit.hot(limit=5):  # Get top 5 hot posts                                           
-                    self._process_submission(submission, content)                                                          
-                                                                                                                            
-            return content                                                                                                 
-                                                                                                                            
-        except Exception as e:                                                                                             
-            raise Exception(f"Failed to parse Reddit content: {str(e)}")                                                   
-                                                                                                                            
-    def _process_submission(self, submission, content: Dict):                                                              
-        """Process a single Reddit submission."""                                                                          
-        content['title'] += submission.title + '\n'                                                                        
-        content['text'] += submission.selftext + '\n'                                                                      
-                                                                                                                            
-        # Get comments                                                                                                     
-        submission.comments.replace_more(limit=0)                                                                          
-        for comment in submission.comments.list()[:10]:  # Get top 10 comments                                             
-            content['comments'].append(comment.body)                                                                       
-                                                                                                                            
-        # Get images if any                                                                                                
-        if hasattr(submission, 'preview'):                                                                                 
-            if 'images' in submission.preview:                                                                             
-                for image in submission.preview['images']:                                                                 
-                    content['images'].append({                                                                             
-                        'url': image['source']['url'],                                                                     
-                        'current_alt': ''                                                                                  
-                    })
\ No newline at end of file
+from clients import get_clients
+from metrics import span
+from ratelimit import get_scheduler, keep_priority
+load_dotenv()
+
+REDDIT_HOT_LIMIT = int(os.getenv("REDDIT_HOT_LIMIT", "5"))
+REDDIT_COMMENT_LIMIT = int(os.getenv("REDDIT_COMMENT_LIMIT", "10"))
+REDDIT_MAX_CONCURRENCY = int(os.getenv("REDDIT_MAX_CONCURRENCY", "8"))
+REDDIT_LISTING_TTL = float(os.getenv("REDDIT_LISTING_TTL", "60"))
+
+# Shared by every RedditParser, so this caps concurrent Reddit calls per process
+_executor = ThreadPoolExecutor(max_workers=REDDIT_MAX_CONCURRENCY, thread_name_prefix="reddit")
+
+
+class ListingCache:
+    """Short-lived cache of hot listings, shared across requests."""
+
+    def __init__(self, ttl: float = REDDIT_LISTING_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subreddit: str) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(subreddit.lower())
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+            return None
+
+    def put(self, subreddit: str, posts: List[Dict]):
+        with self._lock:
+            self._entries[subreddit.lower()] = (time.monotonic(), posts)
+
+
+_listings = ListingCache()
+
+
+class RedditParser:
+    def __init__(self, listings: Optional[ListingCache] = None, reddit: Optional[praw.Reddit] = None):
+        self._reddit = reddit
+        self.listings = listings if listings is not None else _listings
+
+    @property
+    def reddit(self) -> praw.Reddit:
+        # praw.Reddit is not thread-safe, so each thread uses its own client (see clients.py)
+        return self._reddit or get_clients().reddit()
+
+    def parse(self, subreddit_or_url: str) -> Dict:
+        """Parse content from a subreddit or Reddit post URL."""
+        with span('reddit'):
+            return self._parse(subreddit_or_url)
+
+    def _parse(self, subreddit_or_url: str) -> Dict:
+        try:
+            # Check if it's a full post URL or just a subreddit name
+            if 'reddit.com/r/' in subreddit_or_url and '/comments/' in subreddit_or_url:
+                # It's a specific post; one request returns the post and its comments
+                submission = self._limit_comments(self.reddit.submission(url=subreddit_or_url))
+                posts = [get_scheduler().call('reddit', lambda: self._post_data(submission))]
+                # Already fetched with the post, so no second call is scheduled
+                comments = [self._top_comments(submission)]
+            else:
+                # It's a subreddit
+                posts = self._hot_posts(subreddit_or_url)
+
+                # Fetch the comments of every post at the same time, each with its thread's client
+                comments = list(_executor.map(
+                    keep_priority(lambda post_id: get_scheduler().call('reddit', lambda: self._post_comments(post_id))),
+                    [post['id'] for post in posts]
+                ))
+
+            return {
+                'title': ''.join(post['title'] + '\n' for post in posts),
+                'text': ''.join(post['selftext'] + '\n' for post in posts),
+                'comments': [body for post_comments in comments for body in post_comments],
+                'images': [dict(image) for post in posts for image in post['images']]
+            }
+
+        except Exception as e:
+            raise Exception(f"Failed to parse Reddit content: {str(e)}")
+
+    def _hot_posts(self, subreddit_name: str) -> List[Dict]:
+        """Return the hot posts of a subreddit, from the listing cache when fresh."""
+        posts = self.listings.get(subreddit_name)
+        if posts is None:
+            subreddit = self.reddit.subreddit(subreddit_name)
+            posts = get_scheduler().call(
+                'reddit',
+                lambda: [self._post_data(submission) for submission in subreddit.hot(limit=REDDIT_HOT_LIMIT)]
+            )
+            self.listings.put(subreddit_name, posts)
+        return posts
+
+    def _post_data(self, submission) -> Dict:
+        """Extract the fields we use from a submission."""
+        images = []
+        # Get images if any
+        if hasattr(submission, 'preview'):
+            if 'images' in submission.preview:
+                for image in submission.preview['images']:
+                    images.append({
+                        'url': image['source']['url'],
+                        'current_alt': ''
+                    })
+
+        return {
+            'id': submission.id,
+            'title': submission.title,
+            'selftext': submission.selftext,
+            'images': images
+        }
+
+    def _limit_comments(self, submission):
+        """Ask Reddit for the top comments only instead of the whole forest."""
+        submission.comment_sort = 'top'
+        submission.comment_limit = REDDIT_COMMENT_LIMIT
+        return submission
+
+    def _post_comments(self, post_id: str) -> List[str]:
+        """Fetch the top comments of a post."""
+        return self._top_comments(self._limit_comments(self.reddit.submission(id=post_id)))
+
+    def _top_comments(self, submission) -> List[str]:
+        """Fetch the top comments of a submission."""
+        submission.comments.replace_more(limit=0)
+        return [comment.body for comment in submission.comments.list()[:REDDIT_COMMENT_LIMIT]]
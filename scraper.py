@@ -1,37 +1,86 @@
-import requests                                                                                                            
-from bs4 import BeautifulSoup                                                                                              
-from typing import Dict                                                                                                    
-                                                                                                                            
-class WebScraper:                                                                                                          
-    def scrape(self, url: str) -> Dict:                                                                                    
-        """Scrape content from a website URL."""                                                                           
-        try:                                                                                                               
-            response = requests.get(url)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.text, 'html.parser')                                                             
-
-            # Extract main content (customize based on typical website structure)                                          
-            content = {                                                                                                    
-                'title': soup.title.string if soup.title else '',                                                          
-                'text': '',                                                                                                
-                'images': []                                                                                               
-            }                                                                                                              
-
-            # Get main text content                                                                                        
-            main_content = soup.find('main') or soup.find('article') or soup.body                                          
-            if main_content:                                                                                               
-                content['text'] = ' '.join([p.get_text().strip() for p in main_content.find_all('p')])                     
-                                                                                                                            
-            # Get images with their current alt text                                                                       
-            for img in soup.find_all('img'):                                                                               
-                if img.get('src'):                                                                                         
-                    content['images'].append({                                                                             
-                        'url': img['src'],                                                                                 
-                        'current_alt': img.get('alt', ''),                                                                 
-                    })                                                                                                     
-                                                                                                                            
-            return content                                                                                                 
-                                                                                                                            
-        except Exception as e:                                                                                             
-            raise Exception(f"Failed to scrape {url}: {str(e)}")
\ No newline at end of file
+import copy
+import httpx
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from clients import get_clients
+from extractor import extract_html
+from metrics import record_bytes, span
+
+SCRAPER_VALIDATOR_CACHE_SIZE = int(os.getenv("SCRAPER_VALIDATOR_CACHE_SIZE", "1024"))
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled HTTP client used for scraping."""
+    return get_clients().http()
+
+
+class ValidatorCache:
+    """Bounded LRU of ETag/Last-Modified validators and the content they describe."""
+
+    def __init__(self, max_entries: int = SCRAPER_VALIDATOR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[str], Optional[str], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[Tuple[Optional[str], Optional[str], Dict]]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], content: Dict):
+        with self._lock:
+            self._entries[url] = (etag, last_modified, content)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every WebScraper in the process so revalidation survives across requests
+_validators = ValidatorCache()
+
+
+class WebScraper:
+    def __init__(self, client: Optional[httpx.Client] = None, validators: Optional[ValidatorCache] = None):
+        self.client = client or get_http_client()
+        self.validators = validators if validators is not None else _validators
+
+    def scrape(self, url: str) -> Dict:
+        """Scrape content from a website URL."""
+        with span('scrape'):
+            return self._scrape(url)
+
+    def _scrape(self, url: str) -> Dict:
+        try:
+            cached = self.validators.get(url)
+            headers = {}
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+            # Stream the body so the extractor can stop at its byte/text caps
+            with self.client.stream("GET", url, headers=headers) as response:
+                # Page unchanged since the last scrape, reuse what was extracted then
+                if response.status_code == 304 and cached:
+                    return copy.deepcopy(cached[2])
+
+                response.raise_for_status()
+
+                content = extract_html(response.iter_bytes(), encoding=response.charset_encoding)
+                record_bytes('scrape', response.num_bytes_downloaded)
+
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self.validators.put(url, etag, last_modified, copy.deepcopy(content))
+
+            return content
+
+        except Exception as e:
+            raise Exception(f"Failed to scrape {url}: {str(e)}")
@@ -0,0 +1,59 @@
+import threading
+from typing import Callable, Dict, Generic, Optional, TypeVar
+from metrics import REGISTRY
+
+T = TypeVar('T')
+
+FLIGHTS = REGISTRY.counter(
+    'blog_singleflight_calls_total', 'Source fetches, by kind and whether they joined one in flight', ('kind', 'result'))
+
+
+class _Flight(Generic[T]):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and get the same result, or the same exception. Nothing
+    is kept once the call finishes, so later callers start a new one.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            FLIGHTS.inc(kind=self.kind, result='coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        FLIGHTS.inc(kind=self.kind, result='leader')
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from cache import CACHE_DIR, normalize_source, sqlite_connection
+from metrics import REGISTRY
+
+SUMMARY_INDEX_PATH = os.getenv("SUMMARY_INDEX_PATH", str(Path(CACHE_DIR) / "summaries.db"))
+
+SUMMARY_REQUESTS = REGISTRY.counter(
+    'blog_summary_index_requests_total', 'Per-source summaries of blog updates, reused or written', ('result',))
+
+
+def content_hash(item: Dict) -> str:
+    """Hash of the extracted content of a source that goes into the prompt."""
+    data = [item.get('title') or '', item.get('text') or '', item.get('comments', [])]
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+class SummaryIndex:
+    """Persistent per-source summaries, reused when a blog is updated.
+
+    A summary is stored per model and normalized source, with the hash of
+    the content it summarizes; it is reused for as long as the source's
+    content hashes the same. Unlike the content cache nothing here expires,
+    since recurring blogs may only be updated days apart.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or SUMMARY_INDEX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        return sqlite_connection(self._local, self.path)
+
+    def _setup(self):
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                model TEXT NOT NULL,
+                source_type TEXT NOT NULL,
+                source TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (model, source_type, source)
+            );
+        """)
+
+    def get_summary(self, model: str, source_type: str, source: str, digest: str) -> Optional[str]:
+        """Return the summary of a source, or None when there is none for this exact content."""
+        row = self._connection().execute(
+            "SELECT summary FROM summaries WHERE model = ? AND source_type = ? AND source = ? AND content_hash = ?",
+            (model, source_type, normalize_source(source_type, source), digest)
+        ).fetchone()
+        SUMMARY_REQUESTS.inc(result='reused' if row else 'summarized')
+        return row[0] if row else None
+
+    def set_summary(self, model: str, source_type: str, source: str, digest: str, summary: str):
+        """Store the summary of a source, replacing the one of its previous content."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO summaries (model, source_type, source, content_hash, summary, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (model, source_type, normalize_source(source_type, source), digest, summary, time.time())
+        )
+
+
+_index: Optional[SummaryIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_summary_index() -> SummaryIndex:
+    """Return the process-wide summary index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SummaryIndex()
+        return _index
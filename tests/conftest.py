@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the caches and indexes of the modules under test out of the working tree
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="blog-tests-"))
@@ -0,0 +1,131 @@
+import gzip
+import time
+
+import pytest
+
+import blog_store
+from blog_store import BlogStore, blog_title, new_blog_id
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000_000_000_000]
+    monkeypatch.setattr(blog_store, '_last_created', 0)
+    monkeypatch.setattr(blog_store.time, 'time_ns', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlogStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_ids_are_utc(clock, new_york):
+    assert new_blog_id().startswith("blog_20231114_221320_000000_")
+
+
+def test_ids_keep_their_order_when_clocks_go_back(clock, new_york):
+    # 01:43 EDT, then 01:00 EST half an hour later
+    clock[0] = 1_699_163_000 * 10**9
+    before = new_blog_id()
+    clock[0] = 1_699_164_800 * 10**9
+    assert new_blog_id() > before
+
+
+def test_ids_created_in_the_same_microsecond_are_ordered(clock):
+    ids = [new_blog_id() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 1000
+    # The clock did not move, so the ids moved a microsecond each
+    assert ids[-1].startswith("blog_20231114_221320_000999_")
+
+
+def test_blog_title():
+    assert blog_title("Intro\n\n## The Title\ntext") == "The Title"
+    assert blog_title("\n  First line  \nsecond") == "First line"
+    assert blog_title("") == ""
+
+
+def test_saved_blog_can_be_read_before_and_after_it_is_written(store, clock):
+    record = store.save("# Hello\n\nWorld", ai_model='openai', urls=['https://example.com'], input_tokens=5)
+    assert record['title'] == "Hello"
+    assert record['path'] == f"2023/11/{record['id']}.md.gz"
+    assert record['created_at'] == 1_700_000_000
+    assert store.read(record['id']) == "# Hello\n\nWorld"
+
+    store.flush()
+    stored = store.get(record['id'])
+    assert stored['urls'] == ['https://example.com']
+    assert stored['input_tokens'] == 5
+    assert stored['stored_bytes'] > 0
+    assert store.read(record['id']) == "# Hello\n\nWorld"
+    with gzip.open(store.file_path(stored), 'rt', encoding='utf-8') as f:
+        assert f.read() == "# Hello\n\nWorld"
+    assert store.get("blog_missing") is None
+
+
+def test_list_pages_newest_first(store):
+    ids = [store.save(f"# Post {i}")['id'] for i in range(5)]
+    store.flush()
+
+    page, cursor = store.list(limit=2)
+    assert [record['id'] for record in page] == [ids[4], ids[3]]
+    seen = [record['id'] for record in page]
+    while cursor:
+        page, cursor = store.list(limit=2, cursor=cursor)
+        seen += [record['id'] for record in page]
+    assert seen == ids[::-1]
+
+
+def test_list_searches_every_word(store):
+    store.save("# Python tips\n\nAbout asyncio")
+    store.save("# Python news\n\nAbout releases")
+    store.save("# Rust tips")
+    store.flush()
+
+    titles = lambda query: sorted(record['title'] for record in store.list(query=query)[0])
+    assert titles("python") == ["Python news", "Python tips"]
+    assert titles("python tips") == ["Python tips"]
+    assert titles('"tips') == ["Python tips", "Rust tips"]
+    if store.full_text:
+        assert titles("asyncio") == ["Python tips"]
+
+
+def test_draft_is_removed_once_the_blog_is_written(store):
+    draft = store.draft()
+    draft.write("# Streamed")
+    draft.write(" post")
+    assert draft.path.read_text() == "# Streamed post"
+
+    record = store.save("# Streamed post", draft=draft)
+    store.flush()
+    assert not draft.path.exists()
+    assert store.read(record['id']) == "# Streamed post"
+
+
+def test_interrupted_draft_stays_on_disk(store):
+    draft = store.draft()
+    draft.write("# Half a post")
+    draft.close()
+    assert draft.path.parent == store.directory / "drafts"
+    assert draft.path.read_text() == "# Half a post"
+
+
+def test_import_files_skips_blogs_already_imported(store, tmp_path):
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    (legacy / "blog_20240101_090000.md").write_text("# Old post\n\ntext")
+    assert store.import_files(str(legacy)) == 1
+    assert store.import_files(str(legacy)) == 0
+    assert store.read("blog_20240101_090000") == "# Old post\n\ntext"
@@ -0,0 +1,91 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import ContentCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def summed_size(content_cache: ContentCache) -> int:
+    return content_cache._connection().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def accessed_at(content_cache: ContentCache, source: str) -> float:
+    return content_cache._connection().execute(
+        "SELECT accessed_at FROM entries WHERE key = ?", (content_cache.make_key('url', source),)
+    ).fetchone()[0]
+
+
+def test_running_size_follows_writes_replacements_and_clear(tmp_path, clock):
+    content_cache = ContentCache(str(tmp_path / "content.db"), ttls={})
+    content_cache.set('url', 'https://a.example', {'text': 'x' * 100})
+    content_cache.set('url', 'https://b.example', {'text': 'y' * 50})
+    content_cache.set('url', 'https://a.example', {'text': 'short'})
+    assert content_cache.stats()['bytes'] == summed_size(content_cache)
+    assert content_cache.stats()['entries'] == 2
+
+    content_cache.clear()
+    assert content_cache.stats()['bytes'] == 0
+    assert content_cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    content_cache = ContentCache(str(tmp_path / "content.db"), max_bytes=300, ttls={})
+    for name in 'abc':
+        clock[0] += 100
+        content_cache.set('url', f'https://{name}.example', {'text': name * 80})
+    clock[0] += 100
+    assert content_cache.get('url', 'https://a.example') is not None
+    clock[0] += 100
+    content_cache.set('url', 'https://d.example', {'text': 'd' * 80})
+
+    assert content_cache.get('url', 'https://b.example') is None
+    for name in 'acd':
+        assert content_cache.get('url', f'https://{name}.example') is not None
+    assert content_cache.stats()['bytes'] == summed_size(content_cache) <= 300
+
+
+def test_hits_only_write_their_access_time_once_a_minute(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_TOUCH_INTERVAL', 60)
+    content_cache = ContentCache(str(tmp_path / "content.db"), ttls={})
+    content_cache.set('url', 'https://a.example', {'text': 'a'})
+
+    clock[0] += 30
+    assert content_cache.get('url', 'https://a.example') == {'text': 'a'}
+    assert accessed_at(content_cache, 'https://a.example') == 1000
+    clock[0] += 31
+    content_cache.get('url', 'https://a.example')
+    assert accessed_at(content_cache, 'https://a.example') == 1061
+
+
+def test_expired_entries_miss(tmp_path, clock):
+    content_cache = ContentCache(str(tmp_path / "content.db"), ttls={'url': 60})
+    content_cache.set('url', 'https://a.example/?utm_source=x', {'text': 'a'})
+    assert content_cache.get('url', 'https://A.example/') == {'text': 'a'}
+    clock[0] += 61
+    assert content_cache.get('url', 'https://a.example') is None
+
+
+def test_cache_created_before_the_size_total_is_upgraded(tmp_path, clock):
+    path = tmp_path / "content.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE entries (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, "
+        "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO entries VALUES ('old', 'url', '{}', 2, 1, 1)")
+    conn.commit()
+    conn.close()
+
+    content_cache = ContentCache(str(path), ttls={})
+    assert content_cache.stats()['bytes'] == 2
+    content_cache.set('url', 'https://a.example', {'text': 'a'})
+    assert content_cache.stats()['bytes'] == summed_size(content_cache)
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+from dedup import BoilerplateIndex, NearDuplicates, deduplicate, minhash, words
+
+ARTICLE = "The city council approved the new budget on Tuesday after a long debate about transit funding and parks"
+EDITED = "The city council approved the new budget on Tuesday after a long debate about transit funding and schools"
+OTHER = "Researchers found that the migratory birds changed their routes because of warmer winters in the north"
+
+
+def similarity(a: str, b: str) -> float:
+    return sum(x == y for x, y in zip(minhash(words(a)), minhash(words(b)))) / 64
+
+
+def test_minhash_does_not_depend_on_the_hash_seed():
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); from dedup import minhash, words; "
+        f"print(minhash(words({ARTICLE!r})))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    signatures = {
+        subprocess.run(
+            [sys.executable, "-c", script, root], env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True, text=True, check=True
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(signatures) == 1
+
+
+def test_minhash_estimates_similarity():
+    assert similarity(ARTICLE, ARTICLE) == 1
+    assert similarity(ARTICLE, EDITED) > 0.6
+    assert similarity(ARTICLE, OTHER) < 0.2
+
+
+def test_near_duplicates():
+    seen = NearDuplicates(threshold=0.6)
+    assert seen.check(ARTICLE) is None
+    assert seen.check(ARTICLE.upper() + "!") == 'exact'
+    assert seen.check(EDITED) == 'near'
+    assert seen.check(OTHER) is None
+
+
+def test_short_paragraphs_are_only_dropped_when_exact():
+    seen = NearDuplicates()
+    assert seen.check("Thanks for reading") is None
+    assert seen.check("Thanks for reading!") == 'exact'
+    assert seen.check("Thanks for watching") is None
+
+
+def test_boilerplate_needs_several_pages(tmp_path):
+    index = BoilerplateIndex(path=str(tmp_path / "boilerplate.db"), min_pages=3)
+    cookie = "We use cookies to improve your experience."
+    assert index.observe("https://example.com/a", [cookie]) == set()
+    assert index.observe("https://example.com/b", [cookie]) == set()
+    assert len(index.observe("https://example.com/c", [cookie])) == 1
+    # Other sites are counted apart
+    assert index.observe("https://other.com/a", [cookie]) == set()
+
+
+def test_deduplicate_keeps_first_copy_and_leaves_input_alone(tmp_path):
+    index = BoilerplateIndex(path=str(tmp_path / "boilerplate.db"))
+    content = [
+        {'type': 'url', 'source': 'https://a.com/1', 'title': 'A', 'text': f"{ARTICLE}\n{OTHER}"},
+        {'type': 'reddit', 'source': 'news', 'title': 'B', 'text': ARTICLE, 'comments': [OTHER, "Great post"]},
+    ]
+    result = deduplicate(content, index)
+    assert result[0]['text'] == f"{ARTICLE}\n{OTHER}"
+    assert result[1]['text'] == ''
+    assert result[1]['comments'] == ["Great post"]
+    assert content[1]['text'] == ARTICLE
@@ -0,0 +1,52 @@
+import pytest
+
+from extractor import extract_html, sniff_encoding
+
+PARAGRAPH = "Un café “noir”, s'il vous plaît, avec un peu de texte."
+
+
+def page(head: str, encoding: str) -> bytes:
+    return (f"<html><head>{head}<title>Café</title></head>"
+            f"<body><p>{PARAGRAPH}</p></body></html>").encode(encoding)
+
+
+def extract(data: bytes, encoding=None, chunk_size=16):
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    return extract_html(chunks, encoding=encoding, backend='html.parser')
+
+
+@pytest.mark.parametrize('head', [
+    '<meta charset="windows-1252">',
+    "<META CHARSET=cp1252>",
+    '<meta http-equiv="Content-Type" content="text/html; charset=windows-1252">',
+    # Pages labelled Latin-1 are read as Windows-1252, like browsers do
+    '<meta http-equiv="content-type" content="text/html; charset=ISO-8859-1">',
+])
+def test_meta_charset_is_used_without_a_response_charset(head):
+    result = extract(page(head, 'cp1252'))
+    assert result['title'] == "Café"
+    assert result['text'] == PARAGRAPH
+
+
+def test_response_charset_wins_over_the_page():
+    result = extract(page('<meta charset="windows-1252">', 'utf-8'), encoding='utf-8')
+    assert result['text'] == PARAGRAPH
+
+
+def test_pages_without_a_charset_are_utf8():
+    assert extract(page('', 'utf-8'))['text'] == PARAGRAPH
+    assert extract(b'\xef\xbb\xbf' + page('', 'utf-8'))['title'] == "Café"
+
+
+def test_short_pages_are_sniffed_when_the_stream_ends():
+    assert extract(page('<meta charset="cp1252">', 'cp1252'), chunk_size=4096)['text'] == PARAGRAPH
+
+
+@pytest.mark.parametrize('head, encoding', [
+    (b'<meta charset="shift_jis">', 'shift_jis'),
+    (b'<meta charset="utf-16">', 'utf-8'),
+    (b'<meta charset="no-such-charset">', 'utf-8'),
+    (b'<p>no declaration</p>', 'utf-8'),
+])
+def test_sniff_encoding(head, encoding):
+    assert sniff_encoding(head) == encoding
@@ -0,0 +1,135 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import hedging
+from hedging import HedgedBlogGenerator, LatencyTracker
+
+
+class FakeGenerator:
+    """Streams fixed text, optionally after a gate is opened or failing first."""
+
+    def __init__(self, provider, text="post", gate=None, error=None, budget=1000):
+        self.provider = provider
+        self.name = provider.title()
+        self.model = f"{provider}-model"
+        self.packer = SimpleNamespace(budget=budget)
+        self.text = text
+        self.gate = gate
+        self.error = error
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started = threading.Event()
+        self.closed = threading.Event()
+
+    def condense(self, content):
+        return content
+
+    def stream_condensed(self, content):
+        self.started.set()
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            if self.error is not None:
+                raise self.error
+            for word in self.text.split():
+                yield word + " "
+            self.output_tokens += len(self.text.split())
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    monkeypatch.setattr(hedging, 'HEDGE_DEFAULT_DELAY', 0.05)
+    monkeypatch.setattr(hedging, 'HEDGE_MIN_SAMPLES', 3)
+    return LatencyTracker(window=10)
+
+
+def test_primary_answers_without_a_hedge(tracker):
+    primary, hedge = FakeGenerator('openai', "from openai"), FakeGenerator('claude')
+    generator = HedgedBlogGenerator([primary, hedge], tracker)
+    assert generator.generate([]) == "from openai "
+    assert generator.provider == 'openai'
+    assert not hedge.started.is_set()
+
+
+def test_hedge_wins_when_the_primary_is_slow(tracker):
+    gate = threading.Event()
+    primary, hedge = FakeGenerator('openai', gate=gate), FakeGenerator('claude', "from claude")
+    generator = HedgedBlogGenerator([primary, hedge], tracker)
+    try:
+        assert generator.generate([]) == "from claude "
+        assert generator.provider == 'claude'
+        assert generator.model == 'claude-model'
+    finally:
+        gate.set()
+    # The slow primary is cancelled and its stream closed
+    assert primary.closed.wait(5)
+
+
+def test_falls_back_right_away_when_the_primary_fails(tracker, monkeypatch):
+    monkeypatch.setattr(hedging, 'HEDGE_DEFAULT_DELAY', 60)
+    primary = FakeGenerator('openai', error=Exception("boom"))
+    hedge = FakeGenerator('claude', "from claude")
+    generator = HedgedBlogGenerator([primary, hedge], tracker)
+    assert generator.generate([]) == "from claude "
+    assert generator.provider == 'claude'
+
+
+def test_raises_when_every_provider_fails(tracker):
+    generator = HedgedBlogGenerator([
+        FakeGenerator('openai', error=Exception("first")),
+        FakeGenerator('claude', error=Exception("second")),
+    ], tracker)
+    with pytest.raises(Exception, match="Every provider failed: first; second"):
+        generator.generate([])
+
+
+def test_condenses_with_the_smallest_budget_first(tracker):
+    small, large = FakeGenerator('claude', budget=10), FakeGenerator('openai', budget=100)
+    calls = []
+    small.condense = lambda content: calls.append('claude') or content
+    large.condense = lambda content: calls.append('openai') or content
+    HedgedBlogGenerator([large, small], tracker).generate([])
+    assert calls == ['claude']
+
+
+def test_only_the_winners_tokens_are_counted(tracker):
+    gate = threading.Event()
+    primary, hedge = FakeGenerator('openai', "a b c", gate=gate), FakeGenerator('claude', "d e")
+    generator = HedgedBlogGenerator([primary, hedge], tracker)
+    generator.generate([])
+    gate.set()
+    assert primary.closed.wait(5)
+    assert generator.output_tokens == 2
+
+
+def test_hedge_delay_follows_the_percentile(tracker, monkeypatch):
+    monkeypatch.setattr(hedging, 'HEDGE_PERCENTILE', 50)
+    assert tracker.hedge_delay('openai') == 0.05
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        tracker.observe('openai', seconds)
+    assert tracker.percentile('openai', 50) == 3.0
+    assert tracker.hedge_delay('openai') == 3.0
+    tracker.observe('openai', 1000.0)
+    monkeypatch.setattr(hedging, 'HEDGE_PERCENTILE', 99)
+    assert tracker.hedge_delay('openai') == hedging.HEDGE_MAX_DELAY
+
+
+def test_window_keeps_the_recent_latencies(tracker):
+    for _ in range(10):
+        tracker.observe('openai', 100.0)
+    for _ in range(10):
+        tracker.observe('openai', 1.0)
+    assert tracker.percentile('openai', 90) == 1.0
+
+
+def test_fastest_needs_samples_for_every_provider(tracker):
+    for seconds in (1.0, 1.0, 1.0):
+        tracker.observe('claude', seconds)
+    assert tracker.fastest(['openai', 'claude'], 'openai') == 'openai'
+    for seconds in (2.0, 2.0, 2.0):
+        tracker.observe('openai', seconds)
+    assert tracker.fastest(['openai', 'claude'], 'openai') == 'claude'
@@ -0,0 +1,135 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+from jobs import MemoryJobQueue, SQLiteJobQueue, WorkerPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"), lease_timeout=60)
+
+
+def test_jobs_are_claimed_once_in_submission_order(queue, tmp_path, clock):
+    first = queue.submit({'urls': ['a']})
+    clock[0] += 1
+    second = queue.submit({'urls': ['b']})
+    other = SQLiteJobQueue(str(tmp_path / "jobs.db"), lease_timeout=60)
+
+    assert queue.claim('w1')['id'] == first
+    job = other.claim('w2')
+    assert job['id'] == second
+    assert job['payload'] == {'urls': ['b']}
+    assert job['status'] == 'running'
+    assert queue.claim('w1') is None
+
+
+def test_expired_lease_is_handed_out_again(queue, clock):
+    queue.submit({})
+    queue.claim('w1')
+    clock[0] += 30
+    assert queue.claim('w2') is None
+    clock[0] += 31
+    assert queue.claim('w2')['worker'] == 'w2'
+
+
+def test_renewed_lease_is_kept(queue, clock):
+    job_id = queue.submit({})
+    queue.claim('w1')
+    for _ in range(5):
+        clock[0] += 50
+        assert queue.renew(job_id, 'w1')
+        assert queue.claim('w2') is None
+
+
+def test_stale_worker_cannot_complete_a_reclaimed_job(queue, clock):
+    job_id = queue.submit({})
+    queue.claim('w1')
+    clock[0] += 61
+    queue.claim('w2')
+
+    assert not queue.renew(job_id, 'w1')
+    assert not queue.update(job_id, 'w1', status='completed', result={'filename': 'old'})
+    assert queue.get(job_id)['status'] == 'running'
+    assert queue.update(job_id, 'w2', status='completed', result={'filename': 'new'})
+    job = queue.get(job_id)
+    assert job['status'] == 'completed'
+    assert job['result'] == {'filename': 'new'}
+    # A finished job is not written to again, even by the worker that ran it
+    assert not queue.update(job_id, 'w2', status='failed')
+
+
+def test_queue_created_before_leases_is_upgraded(tmp_path, clock):
+    path = tmp_path / "jobs.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, payload TEXT NOT NULL, "
+        "result TEXT, error TEXT, worker TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.execute("INSERT INTO jobs VALUES ('old', 'running', NULL, '{}', NULL, NULL, 'w1', 1, 900, NULL)")
+    conn.commit()
+    conn.close()
+
+    queue = SQLiteJobQueue(str(path), lease_timeout=60)
+    assert queue.claim('w2')['id'] == 'old'
+    assert queue.get('old')['leased_at'] == clock[0]
+
+
+def test_memory_queue_only_lets_the_holder_update():
+    queue = MemoryJobQueue()
+    job_id = queue.submit({})
+    queue.claim('w1')
+    assert not queue.update(job_id, 'w2', stage='generating')
+    assert queue.renew(job_id, 'w1')
+    assert queue.update(job_id, 'w1', status='completed')
+    assert not queue.renew(job_id, 'w1')
+
+
+def test_worker_completes_a_job(queue, monkeypatch):
+    stages = []
+
+    def run_pipeline(on_stage, **kwargs):
+        on_stage('generating')
+        stages.append(queue.get(job_id)['stage'])
+        return {'filename': 'post.md'}
+
+    monkeypatch.setattr(jobs, 'run_pipeline', run_pipeline)
+    job_id = queue.submit({'urls': ['a']})
+    WorkerPool(queue, size=0)._process(queue.claim('w1'), 'w1')
+
+    job = queue.get(job_id)
+    assert stages == ['generating']
+    assert job['status'] == 'completed'
+    assert job['result'] == {'filename': 'post.md'}
+
+
+def test_worker_stops_once_its_job_was_taken_over(queue, clock, monkeypatch):
+    reached = []
+
+    def run_pipeline(on_stage, **kwargs):
+        on_stage('ingesting')
+        # Meanwhile the lease expires and another worker claims the job
+        clock[0] += 61
+        queue.claim('w2')
+        on_stage('generating')
+        reached.append('generating')
+        return {'filename': 'post.md'}
+
+    monkeypatch.setattr(jobs, 'run_pipeline', run_pipeline)
+    job_id = queue.submit({})
+    WorkerPool(queue, size=0)._process(queue.claim('w1'), 'w1')
+
+    job = queue.get(job_id)
+    assert reached == []
+    assert job['status'] == 'running'
+    assert job['worker'] == 'w2'
+    assert job['error'] is None
@@ -0,0 +1,128 @@
+import pytest
+
+import ratelimit
+from ratelimit import ProviderLimiter, Scheduler, TokenBucket, classify_error
+
+
+def admit(bucket: TokenBucket, amount: float, seconds: float):
+    """Admit calls of amount tokens as soon as the bucket allows, on a fake clock; return their times."""
+    now, admitted = 0.0, []
+    while now < seconds:
+        delay = bucket.wait_time(amount, now)
+        if delay == 0:
+            bucket.take(amount)
+            admitted.append(now)
+        else:
+            # Never stall on a delay too small to move the clock
+            now += max(delay, 1e-6)
+    return admitted
+
+
+@pytest.mark.parametrize("tpm, amount", [(40000, 21000), (40000, 500), (300000, 9000)])
+def test_token_bucket_keeps_tokens_per_minute(tpm, amount):
+    bucket = TokenBucket(tpm, now=0.0)
+    minutes = 10
+    admitted = admit(bucket, amount, minutes * 60)
+
+    # Beyond a first burst of one bucket (or one call larger than it), nothing exceeds the rate
+    assert len(admitted) * amount <= tpm * minutes + max(bucket.capacity, amount)
+    for minute in range(1, minutes):
+        in_minute = sum(amount for t in admitted if minute * 60 <= t < (minute + 1) * 60)
+        assert in_minute <= tpm + amount
+
+
+def test_call_larger_than_bucket_leaves_debt():
+    bucket = TokenBucket(40000, now=0.0)
+    assert bucket.capacity < 21000
+    assert bucket.wait_time(21000, 0.0) == 0
+    bucket.take(21000)
+    # Waits for the whole call to be paid back, plus a full bucket for the next one
+    assert bucket.wait_time(21000, 0.0) == pytest.approx(21000 / bucket.rate)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0, now=0.0)
+    bucket.take(10 ** 9)
+    assert bucket.wait_time(10 ** 9, 0.0) == 0
+
+
+def test_batch_waits_for_interactive_callers():
+    limiter = ProviderLimiter('test', concurrency=4)
+    limiter.waiting[ratelimit.INTERACTIVE] = 1
+    assert limiter._admission_delay(0, ratelimit.BATCH, 0.0) == float('inf')
+    assert limiter._admission_delay(0, ratelimit.INTERACTIVE, 0.0) == 0
+
+
+def test_throttling_halves_concurrency_and_honours_retry_after():
+    limiter = ProviderLimiter('test', concurrency=8)
+    limiter.acquire()
+    limiter.release('throttled', retry_after=30)
+    assert limiter.limit == 4
+    assert limiter.blocked_until > 0
+    assert limiter._admission_delay(0, ratelimit.INTERACTIVE, limiter.blocked_until - 10) == pytest.approx(10)
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+class Fatal(Exception):
+    status_code = 400
+
+
+def test_scheduler_retries_throttled_calls(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, 'sleep', lambda seconds: None)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise Throttled()
+        return 'ok'
+
+    assert Scheduler({}).call('test', flaky) == 'ok'
+    assert len(calls) == 3
+
+
+def test_stream_times_only_the_successful_attempt(monkeypatch):
+    clock = [0.0]
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(ratelimit.time, 'sleep', sleep)
+    calls, latencies = [], []
+
+    def stream():
+        calls.append(1)
+        clock[0] += 2
+        if len(calls) < 2:
+            raise Throttled()
+        yield 'a'
+        yield 'b'
+
+    parts = Scheduler({}).stream('test', stream, on_first=latencies.append)
+    assert list(parts) == ['a', 'b']
+    assert len(calls) == 2
+    # The failed attempt and the backoff after it are left out
+    assert clock[0] > 4
+    assert latencies == [pytest.approx(2)]
+
+
+def test_scheduler_does_not_retry_fatal_errors():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise Fatal()
+
+    with pytest.raises(Fatal):
+        Scheduler({}).call('test', fail)
+    assert len(calls) == 1
+
+
+def test_classify_error():
+    assert classify_error(Throttled()) == ('throttled', None)
+    assert classify_error(Fatal()) == ('fatal', None)
+    assert classify_error(TimeoutError())[0] == 'error'
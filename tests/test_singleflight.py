@@ -0,0 +1,90 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import FLIGHTS, SingleFlight
+
+_kinds = itertools.count()
+
+
+@pytest.fixture
+def flights():
+    # A kind of its own, so the metrics only count this test's calls
+    return SingleFlight(f"test-{next(_kinds)}")
+
+
+def counted(flights: SingleFlight, result: str) -> int:
+    return int(FLIGHTS.values().get((flights.kind, result), 0))
+
+
+def run_together(flights: SingleFlight, fn, callers: int):
+    """Call do() from several threads while fn is held open, then let it finish.
+
+    Returns each caller's result or exception.
+    """
+    release = threading.Event()
+
+    def held():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(callers) as executor:
+        futures = [executor.submit(flights.do, 'key', held) for _ in range(callers)]
+        # Wait until every other caller has joined the flight in progress
+        while counted(flights, 'coalesced') < callers - 1:
+            threading.Event().wait(0.001)
+        release.set()
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_calls_share_one_result(flights):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'text': 'page'}
+
+    results = run_together(flights, fn, 8)
+    assert len(calls) == 1
+    assert results == [{'text': 'page'}] * 8
+    # Every caller gets the very same object
+    assert all(result is results[0] for result in results)
+    assert counted(flights, 'leader') == 1
+    assert flights.in_flight() == 0
+
+
+def test_concurrent_calls_share_one_exception(flights):
+    error = ValueError("unreachable")
+
+    def fn():
+        raise error
+
+    assert run_together(flights, fn, 4) == [error] * 4
+    assert flights.in_flight() == 0
+
+
+def test_later_calls_start_a_new_flight(flights):
+    results = iter(['first', 'second'])
+    assert flights.do('key', lambda: next(results)) == 'first'
+    assert flights.do('key', lambda: next(results)) == 'second'
+    assert counted(flights, 'leader') == 2
+    assert counted(flights, 'coalesced') == 0
+
+
+def test_a_failed_call_is_not_remembered(flights):
+    with pytest.raises(KeyError):
+        flights.do('key', lambda: {}['missing'])
+    assert flights.do('key', lambda: 'ok') == 'ok'
+
+
+def test_different_keys_do_not_wait_for_each_other(flights):
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as executor:
+        slow = executor.submit(flights.do, 'slow', lambda: release.wait(5) and 'slow')
+        while flights.in_flight() == 0:
+            threading.Event().wait(0.001)
+        assert flights.do('fast', lambda: 'fast') == 'fast'
+        release.set()
+        assert slow.result() == 'slow'
@@ -0,0 +1,49 @@
+import pytest
+
+import blog_generator
+from blog_generator import BlogGenerator
+from ratelimit import Scheduler
+from summary_index import SummaryIndex, content_hash
+
+
+@pytest.fixture(autouse=True)
+def unlimited(monkeypatch):
+    scheduler = Scheduler({})
+    monkeypatch.setattr(blog_generator, 'get_scheduler', lambda: scheduler)
+
+
+class FakeGenerator(BlogGenerator):
+    provider = 'claude'
+    name = 'Fake'
+    model = 'fake-model'
+
+    def __init__(self, summaries):
+        super().__init__(use_cache=False, summaries=summaries)
+        self.calls = 0
+
+    def _call(self, messages, max_tokens=None):
+        self.calls += 1
+        return f"summary {self.calls}"
+
+
+def source(text, **extra):
+    return {'type': 'url', 'source': 'https://example.com/a', 'title': 'A', 'text': text, **extra}
+
+
+def test_summary_is_reused_while_the_source_is_unchanged(tmp_path):
+    generator = FakeGenerator(SummaryIndex(str(tmp_path / "summaries.db")))
+    long_text = "word " * 5000
+    assert generator._source_summary(source(long_text))['text'] == "summary 1"
+    assert generator._source_summary(source(long_text))['text'] == "summary 1"
+    assert generator._source_summary(source(long_text + "more"))['text'] == "summary 2"
+    assert generator.calls == 2
+
+
+def test_summary_is_keyed_on_the_content_as_extracted(tmp_path):
+    generator = FakeGenerator(SummaryIndex(str(tmp_path / "summaries.db")))
+    extracted = source("word " * 5000)
+    digest = content_hash(extracted)
+    generator._source_summary(source("word " * 5000, content_hash=digest))
+    # Deduplication dropped part of the text this time; the source itself did not change
+    generator._source_summary(source("word " * 4000, content_hash=digest))
+    assert generator.calls == 1
@@ -1,27 +1,106 @@
+from textual import work
 from textual.app import App, ComposeResult
-from textual.containers import Container
-from textual.widgets import Header, Footer, Input, Button, Select
+from textual.containers import Container, Vertical
+from textual.widgets import Header, Footer, Input, Button, Select, DataTable, Log
 from textual.binding import Binding
-from typing import List
-import click
-from trogon import tui
-from cli import create_blog
+from textual.worker import Worker, get_current_worker
+from typing import Dict, List, Optional
+import itertools
+import os
+import threading
+
+# Generations running at once; later ones wait in the queue
+TUI_MAX_GENERATIONS = int(os.getenv("TUI_MAX_GENERATIONS", "3"))
+
+STAGE_LABELS = {
+    'queued': 'Queued',
+    'ingesting': 'Scraping pages and Reddit',
+    'deduplicating': 'Removing repeated content',
+    'processing_images': 'Describing images',
+    'generating': 'Generating',
+    'saving': 'Saving',
+    'done': 'Done',
+    'failed': 'Failed',
+    'cancelling': 'Cancelling',
+    'cancelled': 'Cancelled',
+}
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class Generation:
+    """One queued blog generation.
+
+    The worker thread running it updates these fields; the UI reads them on
+    a timer, so the worker never waits for the screen.
+    """
+
+    def __init__(self, generation_id: str, title: str, urls: List[str], subreddits: List[str], ai_model: str):
+        self.id = generation_id
+        self.title = title
+        self.urls = urls
+        self.subreddits = subreddits
+        self.ai_model = ai_model
+        self.stage = 'queued'
+        self.done: Dict[str, int] = {'url': 0, 'reddit': 0}
+        self.failed: Dict[str, int] = {'url': 0, 'reddit': 0}
+        self.parts: List[str] = []
+        self.filename: Optional[str] = None
+        self.error: Optional[str] = None
+        self.worker: Optional[Worker] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ('done', 'failed', 'cancelled')
+
+    def sources(self) -> str:
+        """Per-source progress, e.g. 'pages 2/3, reddit 1/1 (1 failed)'."""
+        counts = []
+        for source_type, label, total in (('url', 'pages', len(self.urls)), ('reddit', 'reddit', len(self.subreddits))):
+            if total:
+                failed = f" ({self.failed[source_type]} failed)" if self.failed[source_type] else ""
+                counts.append(f"{label} {self.done[source_type]}/{total}{failed}")
+        return ', '.join(counts)
+
+    def status(self) -> str:
+        if self.stage == 'done':
+            return f"Saved to {self.filename}"
+        if self.stage == 'failed':
+            return f"Failed: {self.error}"
+        return STAGE_LABELS.get(self.stage, self.stage)
+
 
 class BlogGeneratorTUI(App):
     """A Textual app to generate AI blogs."""
-    
+
     CSS = """
     Screen {
-        align: center middle;
+        layout: horizontal;
     }
 
     #main-container {
-        width: 80%;
+        width: 40%;
         height: auto;
         border: solid green;
         padding: 2;
     }
 
+    #generations-container {
+        width: 60%;
+    }
+
+    #generations {
+        height: 40%;
+        border: solid green;
+    }
+
+    #preview {
+        height: 60%;
+        border: solid green;
+    }
+
     Input {
         margin: 1;
     }
@@ -38,12 +117,19 @@ class BlogGeneratorTUI(App):
     BINDINGS = [
         Binding("q", "quit", "Quit", show=True),
         Binding("g", "generate", "Generate Blog", show=True),
+        Binding("c", "cancel", "Cancel Selected", show=True),
     ]
 
     def __init__(self):
         super().__init__()
         self.urls: List[str] = []
         self.subreddits: List[str] = []
+        self.generations: List[Generation] = []
+        self._ids = itertools.count(1)
+        self._slots = threading.Semaphore(TUI_MAX_GENERATIONS)
+        # Generation shown in the preview, and how many of its parts were written there
+        self._preview_id: Optional[str] = None
+        self._preview_parts = 0
 
     def compose(self) -> ComposeResult:
         """Create child widgets for the app."""
@@ -53,13 +139,26 @@ class BlogGeneratorTUI(App):
             yield Input(placeholder="Enter URL (press Enter to add)...", id="url-input")
             yield Input(placeholder="Enter subreddit (press Enter to add)...", id="subreddit-input")
             yield Select(
-                [(label, value) for label, value in [("OpenAI", "openai"), ("Claude", "claude")]],
+                [(label, value) for label, value in [("OpenAI", "openai"), ("Claude", "claude"), ("Hedged", "hedged"), ("Auto", "auto")]],
                 prompt="Select AI Model",
                 id="model-select"
             )
             yield Button("Generate Blog", variant="primary", id="generate-btn")
+        with Vertical(id="generations-container"):
+            yield DataTable(id="generations", cursor_type="row")
+            yield Log(id="preview")
         yield Footer()
 
+    def on_mount(self) -> None:
+        table = self.query_one("#generations", DataTable)
+        table.add_column("#", key="id")
+        table.add_column("Title", key="title")
+        table.add_column("Model", key="model")
+        table.add_column("Sources", key="sources")
+        table.add_column("Tokens", key="tokens")
+        table.add_column("Status", key="status")
+        self.set_interval(0.2, self.refresh_generations)
+
     def on_input_submitted(self, event: Input.Submitted) -> None:
         """Handle input submission."""
         if event.input.id == "url-input" and event.value:
@@ -77,39 +176,138 @@ class BlogGeneratorTUI(App):
             self.action_generate()
 
     def action_generate(self) -> None:
-        """Generate the blog post."""
+        """Queue a blog post for generation with the sources added so far."""
         title = self.query_one("#title-input").value
         model = self.query_one("#model-select").value
-        
+
         if not title:
             self.notify("Please enter a title", severity="error")
             return
-        
+
         if not self.urls and not self.subreddits:
             self.notify("Please add at least one URL or subreddit", severity="error")
             return
-            
+
+        if model == Select.BLANK:
+            model = "openai"
+
+        generation = Generation(str(next(self._ids)), title, self.urls, self.subreddits, model)
+        self.generations.append(generation)
+        self.query_one("#generations", DataTable).add_row(
+            generation.id, title, model, generation.sources(), "0", generation.status(), key=generation.id
+        )
+        generation.worker = self.run_generation(generation)
+
+        # Start the next blog from an empty form
+        self.urls, self.subreddits = [], []
+        self.query_one("#title-input").value = ""
+        self.notify(f"Queued '{title}'")
+
+    def action_cancel(self) -> None:
+        """Cancel the generation selected in the table."""
+        generation = self.selected_generation()
+        if generation is None or generation.finished:
+            return
+        generation.stage = 'cancelling'
+        generation.worker.cancel()
+
+    @work(thread=True, group="generation", exit_on_error=False)
+    def run_generation(self, generation: Generation) -> None:
+        """Run a generation in a worker thread, reporting progress on the Generation."""
+        worker = get_current_worker()
+
+        def check_cancelled():
+            if worker.is_cancelled:
+                raise GenerationCancelled()
+
+        def on_stage(stage: str):
+            check_cancelled()
+            generation.stage = stage
+
+        def on_source(source_type: str, source: str, error: Optional[Dict]):
+            # Raising here stops the ingestion, rather than waiting for every source
+            check_cancelled()
+            generation.done[source_type] += 1
+            if error:
+                generation.failed[source_type] += 1
+
+        def on_token(text: str):
+            check_cancelled()
+            generation.parts.append(text)
+
+        # Wait for a free slot, but give up as soon as the generation is cancelled
+        while not self._slots.acquire(timeout=0.2):
+            if worker.is_cancelled:
+                generation.stage = 'cancelled'
+                return
+
         try:
-            # Convert the parameters and call the CLI function
-            urls_tuple = tuple(self.urls)
-            subreddits_tuple = tuple(self.subreddits)
-            
-            # Call the CLI function
-            create_blog.callback(
-                urls=urls_tuple,
-                subreddits=subreddits_tuple,
-                title=title,
-                ai_model=model
+            # Imported here so the TUI opens without loading the provider SDKs
+            from pipeline import run_pipeline
+
+            result = run_pipeline(
+                generation.urls,
+                generation.subreddits,
+                ai_model=generation.ai_model,
+                on_stage=on_stage,
+                on_source=on_source,
+                on_token=on_token,
+                title=generation.title,
             )
-            
-            self.notify("Blog generated and saved to 'blogs' directory!", severity="success")
+            generation.filename = result['filename']
+            generation.stage = 'done'
+        except GenerationCancelled:
+            generation.stage = 'cancelled'
         except Exception as e:
-            self.notify(f"Error generating blog: {str(e)}", severity="error")
+            if worker.is_cancelled:
+                generation.stage = 'cancelled'
+            else:
+                generation.error = str(e)
+                generation.stage = 'failed'
+        finally:
+            self._slots.release()
+
+    def selected_generation(self) -> Optional[Generation]:
+        table = self.query_one("#generations", DataTable)
+        if not self.generations or table.cursor_row < 0:
+            return None
+        return self.generations[min(table.cursor_row, len(self.generations) - 1)]
+
+    def refresh_generations(self) -> None:
+        """Copy the progress of every generation into the table and the preview."""
+        table = self.query_one("#generations", DataTable)
+        for generation in self.generations:
+            table.update_cell(generation.id, "sources", generation.sources())
+            table.update_cell(generation.id, "tokens", str(len(generation.parts)))
+            table.update_cell(generation.id, "status", generation.status())
+
+        generation = self.selected_generation()
+        if generation is None:
+            return
+        preview = self.query_one("#preview", Log)
+        if generation.id != self._preview_id:
+            preview.clear()
+            self._preview_id = generation.id
+            self._preview_parts = 0
+        # Parts are only ever appended, so only write what is new since the last refresh
+        parts = len(generation.parts)
+        if parts > self._preview_parts:
+            preview.write(''.join(generation.parts[self._preview_parts:parts]))
+            self._preview_parts = parts
 
 def run_tui():
     """Run the TUI application."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
     app = BlogGeneratorTUI()
-    app.run()
+    try:
+        app.run()
+    finally:
+        from blog_store import close_store
+        from clients import close_clients
+        close_store()
+        close_clients()
 
 if __name__ == "__main__":
     run_tui()
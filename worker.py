@@ -0,0 +1,33 @@
+import click
+import time
+from dotenv import load_dotenv
+from blog_store import close_store
+from clients import close_clients, get_clients
+from jobs import JOB_WORKERS, WorkerPool, create_job_queue
+
+
+load_dotenv()
+
+@click.command()
+@click.option('--workers', '-w', type=int, default=JOB_WORKERS, show_default=True, help='Number of jobs to run at the same time')
+@click.option('--backend', '-b', default=None, help="Queue backend: 'sqlite' or a 'module:ClassName' path (default: JOB_QUEUE_BACKEND)")
+def run_workers(workers, backend):
+    """Run blog generation workers against the shared job queue."""
+    queue = create_job_queue(backend) if backend else create_job_queue()
+    pool = WorkerPool(queue, size=workers)
+    # Every worker thread shares one set of provider clients
+    get_clients().warm()
+    pool.start()
+    click.echo(f"Started {workers} worker(s). Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        click.echo("Stopping workers...")
+        pool.stop()
+        close_store()
+        close_clients()
+
+if __name__ == '__main__':
+    run_workers()